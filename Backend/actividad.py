@@ -0,0 +1,94 @@
+# Detección de tramos sin movimiento, para no correr MediaPipe sobre ellos
+#
+# Las grabaciones suelen tener varios segundos en que no pasa nada: el paciente
+# esperando a empezar, quieto al terminar o la cámara grabando sin nadie. En
+# esos tramos la inferencia no aporta: el ángulo es el mismo que en los
+# frames de los bordes, que sí se infieren.
+#
+# Para cada frame decodificado se compara una versión chica en escala de grises
+# con la de referencia (el último frame en que hubo movimiento), no con el
+# frame anterior: así un movimiento lento también termina superando el umbral.
+# Un frame se infiere si hubo movimiento a menos de RELLENO_SEGUNDOS de él, hacia
+# atrás o hacia adelante; para saber lo de adelante se retienen esos frames
+# antes de pasarlos a la inferencia.
+import collections
+
+import cv2
+import numpy as np
+
+# Lado largo (px) de la imagen con la que se compara
+LADO_ACTIVIDAD = 64
+# Diferencia de gris (0-255) para contar un píxel como cambiado
+UMBRAL_DIFERENCIA = 15
+# Fracción de píxeles cambiados desde la referencia que cuenta como movimiento
+FRACCION_MOVIMIENTO = 0.01
+# Margen que se infiere antes y después de cada tramo con movimiento
+RELLENO_SEGUNDOS = 0.5
+
+
+class DetectorActividad:
+    """Decide, en orden, qué frames hay que inferir y cuáles se pueden omitir."""
+
+    def __init__(self, fps: float, relleno_segundos: float = RELLENO_SEGUNDOS):
+        self.fps = fps
+        self.relleno = max(1, round(fps * relleno_segundos))
+        self.referencia = None
+        self.ultimo_movimiento = None  # índice del último frame con movimiento
+        self.espera = collections.deque()  # (indice, frame) aún sin decidir
+        self.indice = 0
+        self.omitidos = []  # tramos [desde, hasta] de frames omitidos
+
+    def _hay_movimiento(self, frame: np.ndarray) -> bool:
+        alto, ancho = frame.shape[:2]
+        escala = LADO_ACTIVIDAD / max(alto, ancho)
+        chico = cv2.resize(frame, (max(1, round(ancho * escala)), max(1, round(alto * escala))),
+                           interpolation=cv2.INTER_AREA)
+        gris = cv2.GaussianBlur(cv2.cvtColor(chico, cv2.COLOR_BGR2GRAY), (3, 3), 0)
+        if self.referencia is None:
+            self.referencia = gris
+            return False
+        cambiados = np.count_nonzero(cv2.absdiff(gris, self.referencia) > UMBRAL_DIFERENCIA)
+        if cambiados >= FRACCION_MOVIMIENTO * gris.size:
+            self.referencia = gris
+            return True
+        return False
+
+    def agregar(self, frame: np.ndarray) -> list:
+        """Registra un frame y devuelve los (frame, activo) que ya se pueden decidir."""
+        if self._hay_movimiento(frame):
+            self.ultimo_movimiento = self.indice
+        self.espera.append((self.indice, frame))
+        self.indice += 1
+
+        listos = []
+        # Un frame se decide cuando ya se vieron los `relleno` frames siguientes
+        while self.espera and self.espera[0][0] + self.relleno < self.indice:
+            listos.append(self._decidir(*self.espera.popleft()))
+        return listos
+
+    def terminar(self) -> list:
+        """Decide los frames retenidos al final del video."""
+        listos = [self._decidir(indice, frame) for indice, frame in self.espera]
+        self.espera.clear()
+        return listos
+
+    def _decidir(self, indice: int, frame: np.ndarray):
+        # El último movimiento visto está a lo más `relleno` frames adelante:
+        # si no está tampoco a `relleno` frames atrás, no hubo movimiento cerca
+        activo = self.ultimo_movimiento is not None and self.ultimo_movimiento >= indice - self.relleno
+        if not activo:
+            if self.omitidos and self.omitidos[-1][1] == indice - 1:
+                self.omitidos[-1][1] = indice
+            else:
+                self.omitidos.append([indice, indice])
+        return frame, activo
+
+    def resumen(self) -> dict:
+        return {
+            "frames_omitidos": sum(hasta - desde + 1 for desde, hasta in self.omitidos),
+            "tramos_omitidos": [
+                {"desde": desde, "hasta": hasta,
+                 "inicio": round(desde / self.fps, 2), "fin": round((hasta + 1) / self.fps, 2)}
+                for desde, hasta in self.omitidos
+            ],
+        }
@@ -0,0 +1,239 @@
+# Almacenamiento de los videos y archivos generados
+#
+# Todo lo que se escribe en videos/ (subidas, transcodificaciones, videos
+# anotados, pistas) pide su ruta a ruta(): los archivos se reparten en 256
+# subcarpetas según el hash del nombre (videos/3f/<nombre>), así ninguna
+# carpeta crece sin límite.
+#
+# Los archivos de un análisis se llaman <id>_<algo> y una medición guardada
+# referencia su video anotado (columna medicion.video). Un hilo de limpieza
+# recorre el almacenamiento cada INTERVALO_LIMPIEZA y:
+#   - nunca toca los archivos de un análisis referenciado, los de un trabajo
+#     en curso ni los modificados/usados hace menos de GRACIA segundos;
+#   - borra los huérfanos: todo lo que no es un resultado (subidas y
+#     temporales que quedaron por un error, marcas .subiendo viejas);
+#   - borra los resultados sin referenciar que llevan RETENCION_DIAS sin usarse;
+#   - si aun así se supera PRESUPUESTO_VIDEOS, borra resultados sin
+#     referenciar empezando por los usados hace más tiempo (LRU).
+# Los resultados se borran por análisis completo, nunca archivo por archivo: si
+# no, el LRU podía llevarse las imágenes o el índice de rendiciones de un
+# resultado que la caché sigue entregando. El último uso de un análisis es el
+# del más reciente de sus archivos (fecha de acceso, que tocar() actualiza).
+import hashlib
+import json
+import os
+import threading
+import time
+
+RAIZ = "videos"
+# Bytes que pueden ocupar los archivos en videos/
+PRESUPUESTO_VIDEOS = int(os.getenv("PRESUPUESTO_VIDEOS", 5 * 1024 ** 3))
+# Días que se conserva un resultado que ninguna medición guardada referencia
+RETENCION_DIAS = float(os.getenv("RETENCION_DIAS", 7))
+# Segundos que se respeta un archivo recién escrito o usado (análisis que
+# todavía no se guarda, subida esperando en la cola)
+GRACIA = float(os.getenv("GRACIA_ALMACENAMIENTO", 60 * 60))
+INTERVALO_LIMPIEZA = float(os.getenv("INTERVALO_LIMPIEZA", 10 * 60))
+
+# Sufijos de lo que produce un análisis (las rendiciones del video también
+# terminan en _final.mp4); el resto de los archivos es temporal
+SUFIJOS_RESULTADO = ("_final.mp4", "_pistas.npz", "_hls.m3u8", "_hls_init.mp4", ".m4s",
+                     "_poster.jpg", "_pico.jpg", "_sprite.jpg", "_imagenes.json", "_rendiciones.json")
+# Archivos de nombre fijo de un análisis; las rendiciones y los segmentos HLS
+# se leen de sus índices (ver archivos_analisis)
+ARCHIVOS_ANALISIS = ("_final.mp4", "_pistas.npz", "_poster.jpg", "_pico.jpg", "_sprite.jpg",
+                     "_imagenes.json", "_rendiciones.json", "_hls.m3u8", "_hls_init.mp4")
+# Archivos propios de la API en la raíz
+PROTEGIDOS = {"cache_resultados.json", "cache_resultados.json.tmp"}
+
+_carpetas = set()
+_detener = threading.Event()
+_fuente_referencias = None
+_en_uso = None
+ultima_limpieza = {}
+
+
+def ruta(nombre: str) -> str:
+    """Ruta donde se guarda el archivo `nombre`; crea la subcarpeta si hace falta."""
+    carpeta = os.path.join(RAIZ, hashlib.sha1(nombre.encode()).hexdigest()[:2])
+    if carpeta not in _carpetas:
+        os.makedirs(carpeta, exist_ok=True)
+        _carpetas.add(carpeta)
+    return os.path.join(carpeta, nombre)
+
+
+def id_analisis(path: str) -> str:
+    """Id del análisis al que pertenece un archivo (<id>_final.mp4 -> <id>)."""
+    return os.path.basename(path).split("_", 1)[0]
+
+
+def _nombres_indice(path: str) -> list:
+    # Archivos que nombra un índice: rendiciones (JSON) o segmentos (playlist HLS)
+    try:
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".json"):
+                return [rendicion["archivo"] for rendicion in json.load(f).values()]
+            return [linea.strip() for linea in f if linea.strip() and not linea.startswith("#")]
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return []
+
+
+def archivos_analisis(analisis_id: str) -> list:
+    """Rutas de todos los archivos que existen de un análisis.
+
+    Cada archivo está en la subcarpeta de su nombre, así que no alcanza con
+    listar una carpeta: se arman los nombres fijos más los de sus índices.
+    """
+    nombres = [analisis_id + sufijo for sufijo in ARCHIVOS_ANALISIS]
+    nombres += _nombres_indice(ruta(f"{analisis_id}_rendiciones.json"))
+    nombres += _nombres_indice(ruta(f"{analisis_id}_hls.m3u8"))
+    archivos = []
+    for nombre in dict.fromkeys(nombres):
+        # Los videos de antes de las subcarpetas quedaron en la raíz
+        for path in (ruta(nombre), os.path.join(RAIZ, nombre)):
+            if os.path.exists(path):
+                archivos.append(path)
+    return archivos
+
+
+def tocar(path: str):
+    """Marca el archivo como usado ahora (para la retención y el LRU)."""
+    try:
+        # En nanosegundos para no alterar la fecha de modificación (el ETag depende de ella)
+        os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+    except OSError:
+        pass
+
+
+def referenciados() -> set:
+    """Ids de análisis con una medición guardada.
+
+    Si no se pueden consultar lanza la excepción: sin saber qué está
+    referenciado no se borra nada.
+    """
+    if _fuente_referencias is None:
+        return set()
+    return {id_analisis(video) for video in _fuente_referencias() if video}
+
+
+def eliminar(path: str, ids_referenciados: set = None) -> bool:
+    """Borra el archivo salvo que pertenezca a un análisis referenciado."""
+    if ids_referenciados is None:
+        try:
+            ids_referenciados = referenciados()
+        except Exception as e:
+            print(f"No se pudo consultar qué videos están referenciados, no se borra {path}: {e}")
+            return False
+    if id_analisis(path) in ids_referenciados:
+        return False
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _recorrer():
+    # Archivos sueltos en la raíz (de antes de las subcarpetas) y en cada subcarpeta
+    with os.scandir(RAIZ) as entradas:
+        for entrada in entradas:
+            if entrada.is_file():
+                yield entrada
+            elif entrada.is_dir() and len(entrada.name) == 2:
+                with os.scandir(entrada.path) as archivos:
+                    yield from (a for a in archivos if a.is_file())
+
+
+def limpiar(ids_referenciados: set, en_uso: set = frozenset()) -> dict:
+    """Una pasada de limpieza (ver el comienzo del archivo). Devuelve lo que hizo."""
+    ahora = time.time()
+    total = archivos = borrados = liberados = 0
+    analisis = {}  # id -> {"uso", "en_uso", "archivos": [(path, bytes)]} de los resultados
+
+    def borrar(path, tamano):
+        nonlocal total, borrados, liberados
+        if eliminar(path, ids_referenciados):
+            total -= tamano
+            borrados += 1
+            liberados += tamano
+
+    for entrada in _recorrer():
+        try:
+            info = entrada.stat()
+        except FileNotFoundError:
+            continue
+        total += info.st_size
+        archivos += 1
+
+        nombre = entrada.name
+        ultimo_uso = max(info.st_atime, info.st_mtime)
+        if nombre in PROTEGIDOS or id_analisis(nombre) in ids_referenciados:
+            continue
+
+        if not nombre.endswith(SUFIJOS_RESULTADO):
+            if entrada.path not in en_uso and ahora - ultimo_uso >= GRACIA:
+                borrar(entrada.path, info.st_size)
+            continue
+        grupo = analisis.setdefault(id_analisis(nombre), {"uso": 0, "en_uso": False, "archivos": []})
+        grupo["uso"] = max(grupo["uso"], ultimo_uso)
+        grupo["en_uso"] = grupo["en_uso"] or entrada.path in en_uso
+        grupo["archivos"].append((entrada.path, info.st_size))
+
+    def borrar_analisis(grupo):
+        for path, tamano in grupo["archivos"]:
+            borrar(path, tamano)
+
+    candidatos = []
+    for grupo in analisis.values():
+        if grupo["en_uso"] or ahora - grupo["uso"] < GRACIA:
+            continue
+        if ahora - grupo["uso"] > RETENCION_DIAS * 24 * 60 * 60:
+            borrar_analisis(grupo)
+        else:
+            candidatos.append(grupo)
+
+    for grupo in sorted(candidatos, key=lambda g: g["uso"]):
+        if total <= PRESUPUESTO_VIDEOS:
+            break
+        borrar_analisis(grupo)
+
+    resumen = {
+        "archivos": archivos - borrados,
+        "bytes": total,
+        "borrados": borrados,
+        "bytes_liberados": liberados,
+        "fecha": ahora,
+    }
+    ultima_limpieza.clear()
+    ultima_limpieza.update(resumen)
+    if borrados:
+        print(f"Limpieza de videos: {borrados} archivos borrados ({liberados / 1024 ** 2:.1f} MB)")
+    return resumen
+
+
+def iniciar(fuente_referencias, en_uso=None):
+    """Arranca el hilo de limpieza.
+
+    `fuente_referencias()` devuelve los videos guardados en las mediciones y
+    `en_uso()` las rutas de los trabajos que todavía no terminan.
+    """
+    global _fuente_referencias, _en_uso
+    _fuente_referencias = fuente_referencias
+    _en_uso = en_uso
+    os.makedirs(RAIZ, exist_ok=True)
+    _detener.clear()
+    threading.Thread(target=_ciclo, daemon=True).start()
+
+
+def detener():
+    _detener.set()
+
+
+def _ciclo():
+    while not _detener.is_set():
+        try:
+            limpiar(referenciados(), set(_en_uso()) if _en_uso else frozenset())
+        except Exception as e:
+            # Sin la lista de referencias (base de datos caída) se espera a la próxima vuelta
+            print(f"Error en la limpieza de videos: {e}")
+        _detener.wait(INTERVALO_LIMPIEZA)
@@ -0,0 +1,119 @@
+# Procesamiento de videos fuera del event loop de FastAPI
+import os
+import uuid
+
+from motor import procesar_video, procesar_pistas, procesar_evaluacion, procesar_evaluacion_pistas, LADOS
+from movimientos import ANALIZADORES, obtener_analizador
+from pistas import cargar_pistas
+from medios import se_puede_decodificar, subida_en_curso, transcodificar_mp4, RESOLUCION_INFERENCIA
+from muestreo import PASO_POR_DEFECTO
+from almacenamiento import ruta
+
+# Movimientos que sabemos analizar (en minúsculas, tal como llegan del frontend)
+MOVIMIENTOS = list(ANALIZADORES)
+
+# Evaluación completa por defecto: todo lo que sale de una pasada de Pose
+MOVIMIENTOS_EVALUACION = ["flexión", "abducción"]
+
+# Subir cuando cambie la forma de medir: invalida los resultados en caché
+VERSION_ANALIZADOR = 4
+
+
+def _preparar_video(original_path: str) -> str:
+    # Se lee el archivo tal como llegó (el WebM de la cámara incluido); solo se
+    # transcodifica si OpenCV no es capaz de decodificarlo. Una subida en curso
+    # se decodifica con ffmpeg mientras llega (ver medios.abrir_video)
+    if subida_en_curso(original_path) or se_puede_decodificar(original_path):
+        return original_path
+    if not os.path.exists(original_path):
+        # Subida en streaming cancelada antes de que el worker la tomara
+        raise RuntimeError("La subida del video se interrumpió")
+
+    print(f"No se pudo decodificar {original_path}, transcodificando a mp4")
+    video_path = ruta(f"{uuid.uuid4()}.mp4")
+    try:
+        transcodificar_mp4(original_path, video_path)
+    finally:
+        os.remove(original_path)
+    return video_path
+
+
+def analizar(original_path: str, movimiento: str, lado: str,
+             paso: int = PASO_POR_DEFECTO, adaptativo: bool = False,
+             resolucion: int = RESOLUCION_INFERENCIA, solo_angulos: bool = False,
+             recorte: bool = False, solo_movimiento: bool = False) -> dict:
+    """Analiza el video subido y deja listo el video anotado. Se ejecuta en un worker.
+
+    `paso` y `adaptativo` controlan cada cuántos frames se corre la inferencia
+    (ver muestreo.py) y `resolucion` el lado largo de la imagen que recibe MediaPipe.
+    Con `solo_angulos` no se genera video anotado y "output" vuelve en None.
+    Con `recorte` la inferencia corre solo sobre la región de la persona (ver recorte.py)
+    y con `solo_movimiento` se saltan los tramos en que no se mueve nada (ver actividad.py).
+    """
+    analizador = obtener_analizador(movimiento)
+    video_path = _preparar_video(original_path)
+    try:
+        print(f"Ejecutando modelo de {analizador.nombre}")
+        return procesar_video(analizador, video_path, lado=lado, paso=paso, adaptativo=adaptativo,
+                              resolucion=resolucion, solo_angulos=solo_angulos, recorte=recorte,
+                              solo_movimiento=solo_movimiento)
+    finally:
+        # Eliminar archivos temporales
+        if os.path.exists(video_path):
+            os.remove(video_path)
+
+
+def mediciones_evaluacion(movimientos: list, lados: list) -> list:
+    """Combina movimientos y lados en la lista [(analizador, lado), ...] de una evaluación."""
+    mediciones = [(obtener_analizador(movimiento), lado) for movimiento in movimientos for lado in lados]
+    if not mediciones:
+        raise ValueError("La evaluación necesita al menos un movimiento y un lado")
+    if len({analizador.tipo for analizador, _ in mediciones}) > 1:
+        raise ValueError("No se pueden combinar movimientos de Pose y de manos en una evaluación")
+    return mediciones
+
+
+def evaluar(original_path: str, movimientos: list = MOVIMIENTOS_EVALUACION, lados: list = LADOS,
+            paso: int = PASO_POR_DEFECTO, adaptativo: bool = False,
+            resolucion: int = RESOLUCION_INFERENCIA, solo_angulos: bool = False,
+            recorte: bool = False, solo_movimiento: bool = False) -> dict:
+    """Mide varios movimientos en ambos lados con una sola pasada de inferencia.
+
+    Solo se pueden combinar movimientos del mismo modelo (flexión y abducción
+    salen de Pose; pronación/supinación de Hands).
+    """
+    mediciones = mediciones_evaluacion(movimientos, lados)
+    video_path = _preparar_video(original_path)
+    try:
+        print(f"Ejecutando evaluación de {', '.join(movimientos)} ({', '.join(lados)})")
+        return procesar_evaluacion(mediciones, video_path, paso=paso, adaptativo=adaptativo,
+                                   resolucion=resolucion, solo_angulos=solo_angulos, recorte=recorte,
+                                   solo_movimiento=solo_movimiento)
+    finally:
+        if os.path.exists(video_path):
+            os.remove(video_path)
+
+
+def reanalizar(analisis_id: str, movimiento: str, lado: str) -> dict:
+    """Recalcula los ángulos desde las pistas de un análisis anterior (sin inferencia)."""
+    analizador = obtener_analizador(movimiento)
+    pistas = cargar_pistas(analisis_id)
+    if pistas["tipo"] != analizador.tipo:
+        raise ValueError(f"Las pistas guardadas son de {pistas['tipo']} y no sirven para {analizador.nombre}")
+
+    resultado = procesar_pistas(analizador, pistas["landmarks"], lado, pistas["size"])
+    resultado["pistas"] = analisis_id
+    return resultado
+
+
+def reevaluar(analisis_id: str, movimientos: list, lados: list) -> dict:
+    """Como reanalizar, para varios movimientos y lados a la vez."""
+    mediciones = mediciones_evaluacion(movimientos, lados)
+    pistas = cargar_pistas(analisis_id)
+    for analizador, _ in mediciones:
+        if pistas["tipo"] != analizador.tipo:
+            raise ValueError(f"Las pistas guardadas son de {pistas['tipo']} y no sirven para {analizador.nombre}")
+
+    resultado = procesar_evaluacion_pistas(mediciones, pistas["landmarks"], pistas["size"])
+    resultado["pistas"] = analisis_id
+    return resultado
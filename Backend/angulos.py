@@ -0,0 +1,37 @@
+# Cálculo de ángulos sobre series completas de landmarks
+#
+# Las funciones reciben arrays con cualquier cantidad de dimensiones al inicio
+# (un frame, o frames x ...) y operan sobre todo el video de una vez. Un NaN
+# en los landmarks (frame sin detección) da un ángulo NaN, que se ignora al
+# resumir la serie.
+import numpy as np
+
+# Percentiles que acompañan a min/max: menos sensibles a frames con mala detección
+PERCENTILES = (5, 50, 95)
+
+
+def angulo(a, b, c) -> np.ndarray:
+    """Ángulo en grados (0 a 180) en el vértice `b`, para puntos (..., 2)."""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+    ba = a - b
+    bc = c - b
+    cruz = ba[..., 0] * bc[..., 1] - ba[..., 1] * bc[..., 0]
+    punto = ba[..., 0] * bc[..., 0] + ba[..., 1] * bc[..., 1]
+    return np.degrees(np.abs(np.arctan2(cruz, punto)))
+
+
+def rango(angulos: np.ndarray, minimo_vacio: float = 180.0, maximo_vacio: float = 0.0) -> dict:
+    """min/max y percentiles de una serie de ángulos, sin contar los NaN."""
+    angulos = np.asarray(angulos, dtype=np.float64)
+    angulos = angulos[~np.isnan(angulos)]
+    if angulos.size == 0:
+        return {"max_angle": maximo_vacio, "min_angle": minimo_vacio}
+
+    valores = np.percentile(angulos, PERCENTILES)
+    return {
+        "max_angle": float(angulos.max()),
+        "min_angle": float(angulos.min()),
+        "percentiles": {str(p): round(float(v), 2) for p, v in zip(PERCENTILES, valores)},
+    }
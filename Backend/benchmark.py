@@ -0,0 +1,288 @@
+# Benchmark del análisis de videos
+#
+# Corre cada movimiento sobre un corpus fijo de clips (benchmarks/corpus/) a
+# distintas resoluciones y guarda un JSON por corrida en benchmarks/resultados/,
+# para comparar si un cambio hace el análisis más rápido o cambia los ángulos:
+#
+#   python benchmark.py
+#   python benchmark.py --movimientos flexión abducción --resoluciones 640 0 --escalas 0 720
+#   python benchmark.py --paso 3 --adaptativo --comparar benchmarks/resultados/<anterior>.json
+#   python benchmark.py --comparar benchmarks/resultados/<anterior>.json
+#   python benchmark.py --comparar <anterior>.json <nuevo>.json    (sin correr nada)
+#
+# Cada caso corre en un proceso nuevo con los modelos ya cargados (como un
+# worker de la API), así el pico de memoria es solo el de ese caso y la carga
+# de MediaPipe no cuenta en los tiempos. Etapas que se miden:
+#   subida             escribir el clip en videos/ como lo hace la API
+#   transcodificacion  solo si OpenCV no puede decodificar el clip
+#   decodificacion, actividad, inferencia (preparacion = reducir y pasar a RGB),
+#   anotacion, codificacion   (ver pipeline.py)
+#   cierre             ffmpeg terminando el MP4, pistas e imágenes (ver motor.py)
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+
+try:
+    import resource
+except ImportError:  # Windows: sin pico de memoria
+    resource = None
+
+import pool_modelos
+from almacenamiento import ruta
+from analisis import _preparar_video, MOVIMIENTOS
+from herramientas import ejecutar_sincrono
+from medios import RESOLUCION_INFERENCIA, TIEMPO_MAXIMO_TRANSCODIFICACION
+from miniaturas import cargar_imagenes
+from motor import procesar_video
+from muestreo import PASO_POR_DEFECTO
+from movimientos import obtener_analizador
+from pistas import ruta_pistas
+
+CARPETA_CORPUS = os.path.join("benchmarks", "corpus")
+CARPETA_RESULTADOS = os.path.join("benchmarks", "resultados")
+EXTENSIONES = (".mp4", ".webm", ".mov")
+# Mismo tamaño de bloque con que main.guardar_subida escribe las subidas
+TAMANO_BLOQUE = 1024 * 1024
+# Claves del resultado que no son mediciones
+NO_MEDICIONES = {"message", "output", "lado", "pistas", "rendimiento", "imagenes", "rendiciones", "cache"}
+
+
+def _pico_memoria_mb():
+    """Pico de memoria residente del proceso y de sus hijos terminados (ffmpeg), en MB."""
+    if resource is None:
+        return None, None
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    unidad = 1024 * 1024 if sys.platform == "darwin" else 1024
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unidad
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unidad
+    return round(propio, 1), round(hijos, 1)
+
+
+def _borrar_resultado(resultado: dict):
+    archivos = [resultado.get("output"), ruta_pistas(resultado["pistas"])]
+    if cargar_imagenes(resultado["pistas"]) is not None:
+        archivos += [ruta(f"{resultado['pistas']}_{nombre}")
+                     for nombre in ("poster.jpg", "pico.jpg", "sprite.jpg", "imagenes.json")]
+    # Las rendiciones además del original y su índice (ver medios.RENDICIONES)
+    archivos += [ruta(rendicion["archivo"]) for nombre, rendicion in resultado.get("rendiciones", {}).items()
+                 if nombre != "original"]
+    archivos.append(ruta(f"{resultado['pistas']}_rendiciones.json"))
+    for archivo in archivos:
+        if archivo and os.path.exists(archivo):
+            os.remove(archivo)
+
+
+def correr_caso(clip: str, movimiento: str, lado: str, resolucion: int, opciones: dict) -> dict:
+    """Un análisis completo del clip. Se ejecuta en un proceso nuevo."""
+    memoria_base, _ = _pico_memoria_mb()
+    inicio_total = time.perf_counter()
+
+    inicio = time.perf_counter()
+    subida = ruta(f"{uuid.uuid4()}_{os.path.basename(clip)}")
+    with open(clip, "rb") as origen, open(subida, "wb") as destino:
+        shutil.copyfileobj(origen, destino, TAMANO_BLOQUE)
+    segundos_subida = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    video = _preparar_video(subida)
+    segundos_transcodificacion = time.perf_counter() - inicio
+
+    try:
+        resultado = procesar_video(obtener_analizador(movimiento), video, lado=lado,
+                                   resolucion=resolucion, **opciones)
+    finally:
+        if os.path.exists(video):
+            os.remove(video)
+    total = time.perf_counter() - inicio_total
+    _borrar_resultado(resultado)
+
+    rendimiento = resultado["rendimiento"]
+    etapas = {
+        "subida": {"segundos": round(segundos_subida, 3)},
+        "transcodificacion": {"segundos": round(segundos_transcodificacion, 3),
+                              "necesaria": video != subida},
+    }
+    etapas.update({nombre: valor for nombre, valor in rendimiento.items()
+                   if nombre not in ("total", "cuello_de_botella")})
+    memoria, memoria_ffmpeg = _pico_memoria_mb()
+    frames = rendimiento["total"]["frames"]
+    return {
+        "etapas": etapas,
+        "pipeline": rendimiento["total"],
+        "cuello_de_botella": rendimiento["cuello_de_botella"],
+        "segundos": round(total, 3),
+        "fps": round(frames / total, 1) if total else None,
+        "memoria_mb": {"base": memoria_base, "pico": memoria, "pico_ffmpeg": memoria_ffmpeg},
+        "mediciones": {clave: valor for clave, valor in resultado.items() if clave not in NO_MEDICIONES},
+    }
+
+
+def datos_clip(path: str) -> dict:
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {
+            "ancho": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "alto": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": round(fps, 3),
+            "frames": frames,
+            "duracion": round(frames / fps, 2) if fps else None,
+            "bytes": os.path.getsize(path),
+        }
+    finally:
+        cap.release()
+
+
+def escalar_clip(path: str, alto: int, carpeta: str) -> str:
+    """Copia del clip reescalada a `alto` px (con ffmpeg, calidad alta para no medir artefactos)."""
+    nombre, _ = os.path.splitext(os.path.basename(path))
+    destino = os.path.join(carpeta, f"{nombre}_{alto}p.mp4")
+    ejecutar_sincrono("escalado", ["ffmpeg", "-y", "-loglevel", "error", "-i", path, "-vf", f"scale=-2:{alto}",
+                                   "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-an", destino],
+                      TIEMPO_MAXIMO_TRANSCODIFICACION)
+    return destino
+
+
+def _version_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _entorno() -> dict:
+    import mediapipe
+    import numpy
+    return {
+        "commit": _version_git(),
+        "python": platform.python_version(),
+        "sistema": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "mediapipe": mediapipe.__version__,
+        "numpy": numpy.__version__,
+    }
+
+
+def _clave_caso(caso: dict) -> tuple:
+    return (caso["clip"], caso["escala"], caso["movimiento"], caso["lado"], caso["resolucion"],
+            json.dumps(caso["opciones"], sort_keys=True))
+
+
+def comparar(anterior: dict, actual: dict):
+    """Imprime, caso por caso, cómo cambiaron los fps y los ángulos entre dos corridas."""
+    previos = {}
+    for caso in anterior["casos"]:
+        previos.setdefault(_clave_caso(caso), caso)
+    print(f"\nComparación {anterior['entorno'].get('commit')} -> {actual['entorno'].get('commit')}")
+    for caso in actual["casos"]:
+        previo = previos.get(_clave_caso(caso))
+        if previo is None or "error" in previo or "error" in caso:
+            continue
+        cambio = (caso["fps"] / previo["fps"] - 1) * 100 if previo["fps"] else 0.0
+        linea = (f"{caso['clip']} {caso['escala'] or 'original'} {caso['movimiento']} r={caso['resolucion']}: "
+                 f"{previo['fps']} -> {caso['fps']} fps ({cambio:+.1f}%)")
+        if caso["mediciones"] != previo["mediciones"]:
+            linea += "  [cambiaron los ángulos]"
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del análisis de videos")
+    parser.add_argument("clips", nargs="*", help=f"clips o carpetas (por defecto {CARPETA_CORPUS})")
+    parser.add_argument("--movimientos", nargs="+", default=MOVIMIENTOS)
+    parser.add_argument("--lados", nargs="+", default=["derecha"])
+    parser.add_argument("--resoluciones", nargs="+", type=int, default=[RESOLUCION_INFERENCIA],
+                        help="lado largo de la imagen que recibe MediaPipe (0 = original)")
+    parser.add_argument("--escalas", nargs="+", type=int, default=[0],
+                        help="alto al que se reescala cada clip antes de analizarlo (0 = original)")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--paso", type=int, default=PASO_POR_DEFECTO,
+                        help="inferir cada N frames (ver muestreo.py)")
+    parser.add_argument("--adaptativo", action="store_true")
+    parser.add_argument("--recorte", action="store_true")
+    parser.add_argument("--solo-movimiento", action="store_true")
+    parser.add_argument("--solo-angulos", action="store_true")
+    parser.add_argument("--salida", help="archivo JSON de resultados")
+    parser.add_argument("--comparar", nargs="+", metavar="JSON",
+                        help="corrida anterior con la que comparar; con dos archivos solo se comparan")
+    args = parser.parse_args()
+
+    if args.comparar and len(args.comparar) == 2:
+        with open(args.comparar[0], encoding="utf-8") as a, open(args.comparar[1], encoding="utf-8") as b:
+            comparar(json.load(a), json.load(b))
+        return
+
+    rutas = args.clips or [CARPETA_CORPUS]
+    clips = []
+    for path in rutas:
+        if os.path.isdir(path):
+            clips += sorted(os.path.join(path, n) for n in os.listdir(path) if n.lower().endswith(EXTENSIONES))
+        else:
+            clips.append(path)
+    opciones = {"paso": args.paso, "adaptativo": args.adaptativo,
+                "recorte": args.recorte, "solo_movimiento": args.solo_movimiento,
+                "solo_angulos": args.solo_angulos}
+
+    corrida = {"fecha": datetime.now().isoformat(timespec="seconds"), "entorno": _entorno(),
+               "clips": {}, "casos": []}
+    temporal = tempfile.mkdtemp(prefix="benchmark_")
+    # Un proceso por caso, con los modelos cargados como en los workers de la API
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=pool_modelos.iniciar_worker, max_tasks_per_child=1)
+    try:
+        for clip in clips:
+            for escala in args.escalas:
+                path = escalar_clip(clip, escala, temporal) if escala else clip
+                nombre = os.path.basename(clip)
+                corrida["clips"][f"{nombre}@{escala or 'original'}"] = datos_clip(path)
+                for movimiento in args.movimientos:
+                    for lado in args.lados:
+                        for resolucion in args.resoluciones:
+                            for repeticion in range(args.repeticiones):
+                                caso = {"clip": nombre, "escala": escala, "movimiento": movimiento,
+                                        "lado": lado, "resolucion": resolucion, "opciones": opciones,
+                                        "repeticion": repeticion}
+                                try:
+                                    caso.update(executor.submit(correr_caso, path, movimiento, lado,
+                                                                resolucion, opciones).result())
+                                    print(f"{nombre} {escala or 'original'} {movimiento} {lado} "
+                                          f"r={resolucion}: {caso['fps']} fps, {caso['segundos']} s, "
+                                          f"pico {caso['memoria_mb']['pico']} MB")
+                                except Exception as e:
+                                    caso["error"] = str(e)
+                                    print(f"{nombre} {movimiento} {lado}: error {e}")
+                                corrida["casos"].append(caso)
+    finally:
+        executor.shutdown()
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    salida = args.salida or os.path.join(
+        CARPETA_RESULTADOS, f"{datetime.now():%Y%m%d_%H%M%S}_{corrida['entorno']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(corrida, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as f:
+            comparar(json.load(f), corrida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Caché de resultados por contenido del video subido
+#
+# La clave es (hash del archivo, movimiento, lado, versión del analizador y
+# opciones que cambian el resultado). Si el mismo clip se sube de nuevo
+# (reintentos, doble clic, red móvil inestable) se devuelve el resultado
+# guardado sin volver a procesarlo. Los archivos generados (video anotado,
+# rendiciones, pistas, imágenes) cuentan para el presupuesto; al superarlo se
+# eliminan las entradas usadas hace más tiempo (LRU) junto con todos los
+# archivos del análisis, salvo que una medición guardada los referencie (ver
+# almacenamiento.py).
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import almacenamiento
+from pistas import ruta_pistas
+
+RUTA_INDICE = os.path.join(almacenamiento.RAIZ, "cache_resultados.json")
+# Presupuesto en disco de los archivos cacheados (bytes)
+TAMANO_MAXIMO_CACHE = int(os.getenv("TAMANO_MAXIMO_CACHE", 2 * 1024 ** 3))
+
+_lock = threading.Lock()
+_entradas = OrderedDict()  # clave -> {"resultado", "bytes", "ultimo_uso"}; la más vieja primero
+
+
+def clave(contenido_hash: str, movimiento: str, lado: str, version, **opciones) -> str:
+    partes = [contenido_hash, movimiento.lower(), lado.lower(), f"v{version}"]
+    partes += [f"{nombre}={opciones[nombre]}" for nombre in sorted(opciones)]
+    return "|".join(partes)
+
+
+def nuevo_hash():
+    return hashlib.sha256()
+
+
+def _archivos(resultado: dict) -> list:
+    """Archivos que el resultado nombra: sin alguno de ellos la entrada ya no sirve."""
+    analisis_id = resultado.get("pistas")
+    archivos = []
+    if resultado.get("output"):
+        archivos.append(resultado["output"])
+    if analisis_id:
+        archivos.append(ruta_pistas(analisis_id))
+    if resultado.get("rendiciones"):
+        archivos.append(almacenamiento.ruta(f"{analisis_id}_rendiciones.json"))
+        archivos += [almacenamiento.ruta(r["archivo"]) for r in resultado["rendiciones"].values()]
+    if resultado.get("imagenes"):
+        archivos.append(almacenamiento.ruta(f"{analisis_id}_imagenes.json"))
+        for imagen in resultado["imagenes"].values():
+            url = imagen if isinstance(imagen, str) else imagen["url"]
+            archivos.append(almacenamiento.ruta(os.path.basename(url)))
+    return list(dict.fromkeys(archivos))
+
+
+def _todos_los_archivos(resultado: dict) -> list:
+    # Lo anterior más lo que se genera después (HLS): todo lo que hay del análisis
+    if not resultado.get("pistas"):
+        return _archivos(resultado)
+    return almacenamiento.archivos_analisis(resultado["pistas"])
+
+
+def _guardar_indice():
+    temporal = RUTA_INDICE + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(list(_entradas.items()), f)
+    os.replace(temporal, RUTA_INDICE)
+
+
+def cargar():
+    """Lee el índice del disco al iniciar la API."""
+    if not os.path.exists(RUTA_INDICE):
+        return
+    try:
+        with open(RUTA_INDICE, encoding="utf-8") as f:
+            entradas = json.load(f)
+    except (OSError, ValueError):
+        print("Índice de caché ilegible, se empieza de cero")
+        return
+    with _lock:
+        _entradas.clear()
+        for clave_entrada, entrada in sorted(entradas, key=lambda e: e[1]["ultimo_uso"]):
+            _entradas[clave_entrada] = entrada
+
+
+def obtener(clave_entrada: str):
+    """Resultado cacheado o None. Cuenta como uso para el LRU."""
+    with _lock:
+        entrada = _entradas.get(clave_entrada)
+        if entrada is None:
+            return None
+        # Si alguien borró los archivos a mano, la entrada ya no sirve
+        if not all(os.path.exists(a) for a in _archivos(entrada["resultado"])):
+            del _entradas[clave_entrada]
+            _guardar_indice()
+            return None
+        entrada["ultimo_uso"] = time.time()
+        _entradas.move_to_end(clave_entrada)
+        for archivo in _todos_los_archivos(entrada["resultado"]):
+            almacenamiento.tocar(archivo)
+        _guardar_indice()
+        resultado = copy.deepcopy(entrada["resultado"])
+    resultado["cache"] = True
+    return resultado
+
+
+def guardar(clave_entrada: str, resultado: dict):
+    tamano = sum(os.path.getsize(a) for a in _archivos(resultado) if os.path.exists(a))
+    with _lock:
+        _entradas[clave_entrada] = {
+            "resultado": resultado,
+            "bytes": tamano,
+            "ultimo_uso": time.time(),
+        }
+        _entradas.move_to_end(clave_entrada)
+        _expulsar()
+        _guardar_indice()
+
+
+def _expulsar():
+    # Se eliminan las entradas menos usadas hasta volver al presupuesto
+    total = sum(e["bytes"] for e in _entradas.values())
+    while total > TAMANO_MAXIMO_CACHE and len(_entradas) > 1:
+        _, entrada = _entradas.popitem(last=False)
+        total -= entrada["bytes"]
+        # Los archivos de una medición guardada se quedan aunque salgan de la caché
+        for archivo in _todos_los_archivos(entrada["resultado"]):
+            almacenamiento.eliminar(archivo)
@@ -415,12 +415,17 @@ def create_medicion(db: Session, medicion: MedicionCreate):
         MovimientoId=medicion.MovimientoId,
         anguloMin=medicion.anguloMin,
         anguloMax=medicion.anguloMax,
+        video=medicion.video,
     )
     db.add(db_medicion)
     db.commit()
     db.refresh(db_medicion)
     return db_medicion
 
+def get_videos_mediciones(db: Session):
+    # Videos anotados que las mediciones guardadas referencian (no se borran)
+    return [video for (video,) in db.query(MedicionDB.video).filter(MedicionDB.video.isnot(None)).all()]
+
 def delete_medicion(db: Session, medicion_id: int):
     medicion = db.query(models.medicion).filter(models.medicion.medicionId == medicion_id).first()
     if medicion:
@@ -517,6 +522,7 @@ def create_sesion_with_medicion(db: Session, data: SesionWithMedicion):
         anguloMin=data.anguloMin,
         anguloMax=data.anguloMax,
         lado=data.lado,
+        video=data.video,
     )
     db.add(nueva_medicion)
     db.commit()
@@ -551,6 +557,7 @@ def get_medicion_completa(db: Session, medicion_id: int):
         "anguloMin": medicion.anguloMin,
         "anguloMax": medicion.anguloMax,
         "lado": medicion.lado,
+        "video": medicion.video,
         "MovimientoId": medicion.MovimientoId,
         "EjercicioId": medicion.EjercicioId,
 
@@ -610,6 +617,7 @@ def get_mediciones_por_paciente_completas(db: Session, paciente_id: int):
             "anguloMin": medicion.anguloMin,
             "anguloMax": medicion.anguloMax,
             "lado": medicion.lado,
+            "video": medicion.video,
             "MovimientoId": medicion.MovimientoId,
             "EjercicioId": medicion.EjercicioId,
 
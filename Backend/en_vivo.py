@@ -0,0 +1,118 @@
+# Medición en vivo: la cámara manda frames sueltos (JPEG/WebP) por WebSocket
+# y se responde el ángulo de cada uno apenas se procesa.
+#
+# Cada conexión tiene su propio estimador de MediaPipe en modo video, así el
+# tracker se mantiene entre frames igual que al analizar un archivo. Las
+# mediciones usan los mismos analizadores que el análisis de videos (ver
+# motor.py), por lo que los números son comparables.
+import os
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from pool_modelos import crear_pose, crear_hands
+from medios import imagen_para_inferencia, RESOLUCION_INFERENCIA
+from motor import validar_lado
+from pistas import GrabadorPistas
+
+# Sesiones simultáneas: cada una ocupa un núcleo mientras recibe frames
+MAXIMO_SESIONES_EN_VIVO = int(os.getenv("MAXIMO_SESIONES_EN_VIVO", os.cpu_count() or 1))
+
+CREADORES = {
+    "pose": crear_pose,
+    "hands": crear_hands,
+}
+
+
+def _combinar(acumulado: dict, parcial: dict) -> dict:
+    """Junta dos resultados de Analizador.resultado quedándose con el rango más amplio."""
+    for clave, valor in parcial.items():
+        if isinstance(valor, dict) and clave != "percentiles":
+            acumulado[clave] = _combinar(acumulado.get(clave, {}), valor)
+        elif clave == "max_angle":
+            acumulado[clave] = max(acumulado.get(clave, valor), valor)
+        elif clave == "min_angle":
+            acumulado[clave] = min(acumulado.get(clave, valor), valor)
+    return acumulado
+
+
+class SesionEnVivo:
+    """Estado de una conexión: estimador, rango acumulado y landmarks recibidos.
+
+    No es thread-safe: todos los métodos se llaman desde el mismo hilo, que es
+    también el que usa el grafo de MediaPipe.
+    """
+
+    def __init__(self, analizador, lado: str, resolucion: int = RESOLUCION_INFERENCIA):
+        self.analizador = analizador
+        self.lado = validar_lado(lado)
+        self.resolucion = resolucion
+        self.modelo = CREADORES[analizador.tipo]()
+        self.pistas = GrabadorPistas(analizador.tipo, analizador.forma)
+        self.size = None
+        self.acumulado = {}
+        self.inicio = time.monotonic()
+
+    def procesar(self, datos: bytes) -> dict:
+        inicio = time.perf_counter()
+        frame = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Frame inválido: se esperan imágenes JPEG o WebP")
+        decodificado = time.perf_counter()
+
+        # El primer frame fija el tamaño (con el que se miden los ángulos en píxeles)
+        if self.size is None:
+            self.size = (frame.shape[1], frame.shape[0])
+        elif (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size)
+
+        landmarks = self.analizador.extraer(
+            self.modelo.process(imagen_para_inferencia(frame, self.resolucion)))
+        inferido = time.perf_counter()
+        self.pistas.agregar(landmarks, True)
+
+        angulo = texto = None
+        if landmarks is not None:
+            medida = self.analizador.medir(landmarks, self.lado, self.size)
+            if medida is not None:
+                angulo = self.analizador.senal(landmarks, self.lado, self.size)
+                texto = self.analizador.texto(medida, self.lado)
+                parcial = self.analizador.resultado(landmarks[np.newaxis], self.lado, self.size)
+                self.acumulado = _combinar(self.acumulado, parcial)
+
+        fin = time.perf_counter()
+        return {
+            "frame": self.pistas.frames - 1,
+            "angulo": angulo,
+            "texto": texto,
+            "acumulado": self.acumulado,
+            "latencia_ms": {
+                "decodificacion": round((decodificado - inicio) * 1000, 1),
+                "inferencia": round((inferido - decodificado) * 1000, 1),
+                "total": round((fin - inicio) * 1000, 1),
+            },
+        }
+
+    def resumen(self) -> dict:
+        """Resultado final sobre todos los frames recibidos; guarda las pistas para re-analizar."""
+        resultado = {
+            "message": "Medición en vivo terminada.",
+            "output": None,
+            "lado": self.lado,
+            "frames": self.pistas.frames,
+        }
+        if self.pistas.frames == 0:
+            return resultado
+
+        resultado.update(self.analizador.resultado(self.pistas.landmarks, self.lado, self.size))
+        # fps real con el que llegaron los frames
+        fps = self.pistas.frames / max(time.monotonic() - self.inicio, 1e-3)
+        analisis_id = str(uuid.uuid4())
+        self.pistas.guardar(analisis_id, fps, self.size)
+        resultado["pistas"] = analisis_id
+        return resultado
+
+    def cerrar(self):
+        self.modelo.close()
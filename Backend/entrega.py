@@ -0,0 +1,230 @@
+# Entrega de los videos procesados al navegador
+#
+# /video/<id> sirve el video anotado de un análisis con soporte de Range
+# (FileResponse de Starlette) y cabeceras de caché: el archivo de un análisis
+# no cambia nunca, así que lleva un ETag fuerte y se puede guardar por un año.
+#
+# Para que el navegador empiece a reproducir sin bajar todo el archivo, el
+# índice (moov) tiene que estar antes de los datos (mdat). EscritorH264 ya lo
+# escribe así; los videos de antes que no lo cumplen se reordenan con ffmpeg
+# (sin recodificar) la primera vez que se piden.
+#
+# Opcionalmente /video/<id>/hls entrega el mismo video como HLS con segmentos
+# fMP4, que se generan la primera vez que se piden (copiando el H.264, sin
+# recodificar). Con sesiones largas el reproductor baja solo los segmentos
+# que necesita y al buscar no vuelve a pedir el archivo.
+#
+# ffmpeg corre con herramientas.ejecutar: mientras reordena o segmenta un
+# video la API sigue atendiendo otros pedidos.
+#
+# Cada análisis guarda varias rendiciones del video (ver medios.RENDICIONES).
+# Con ?calidad=<nombre> se pide una; si no, se elige según las client hints del
+# navegador: con Save-Data o una conexión lenta (ECT) la más chica; con
+# Viewport-Width y DPR la primera que cubre el ancho de la pantalla; y con
+# Downlink la más grande cuyo bitrate entra en la conexión. Sin pistas, el original.
+# Los navegadores solo mandan esas pistas a otro origen (el frontend en :3000
+# pidiendo a la API en :8000) si se delegan, así que ahí solo llega Save-Data:
+# el frontend elige la calidad y la pide con ?calidad= (ver video.api.ts).
+import asyncio
+import os
+import re
+import struct
+import tempfile
+import uuid
+import weakref
+
+import metricas
+from almacenamiento import RAIZ, ruta
+from herramientas import ejecutar
+from medios import cargar_rendiciones
+
+# Client hints que se usan para elegir la rendición (se piden con Accept-CH)
+PISTAS_CLIENTE = ("Sec-CH-Viewport-Width", "Viewport-Width", "Sec-CH-DPR", "DPR", "ECT", "Downlink", "Save-Data")
+CONEXIONES_LENTAS = {"slow-2g", "2g", "3g"}
+# Parte del ancho de banda informado (Downlink) que puede ocupar el video
+FRACCION_DOWNLINK = 0.8
+
+# Duración objetivo de cada segmento HLS (se cortan en keyframes)
+SEGUNDOS_SEGMENTO_HLS = 4
+
+# Se borran solos cuando ningún pedido los está usando
+_locks = weakref.WeakValueDictionary()
+_verificados = set()  # videos con el moov al inicio
+
+
+def _lock(clave: str) -> asyncio.Lock:
+    # Un lock por video: dos pedidos simultáneos no reordenan ni segmentan dos veces
+    lock = _locks.get(clave)
+    if lock is None:
+        lock = _locks[clave] = asyncio.Lock()
+    return lock
+
+
+def validar_id(analisis_id: str) -> str:
+    """El id viene en la URL: solo se aceptan UUID (nada de rutas)."""
+    try:
+        return str(uuid.UUID(analisis_id))
+    except ValueError:
+        raise ValueError("Id de análisis inválido")
+
+
+def ruta_video(analisis_id: str):
+    """Video anotado del análisis, o None si no existe (o ya se borró)."""
+    nombre = f"{analisis_id}_final.mp4"
+    # Los videos de antes de las subcarpetas quedaron en la raíz
+    for path in (ruta(nombre), os.path.join(RAIZ, nombre)):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def rendiciones_disponibles(analisis_id: str) -> dict:
+    """{nombre: rendición} de las que siguen en disco, de la más chica a la más grande."""
+    rendiciones = cargar_rendiciones(analisis_id) or {}
+    disponibles = [(nombre, r) for nombre, r in rendiciones.items() if os.path.exists(ruta(r["archivo"]))]
+    return dict(sorted(disponibles, key=lambda item: item[1]["ancho"] * item[1]["alto"]))
+
+
+def _numero(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def elegir_rendicion(rendiciones: dict, cabeceras) -> str:
+    """Nombre de la rendición que conviene según las client hints; `rendiciones` ordenadas."""
+    nombres = list(rendiciones)
+    if cabeceras.get("save-data", "").lower() == "on" or cabeceras.get("ect", "").lower() in CONEXIONES_LENTAS:
+        return nombres[0]
+
+    ancho_pantalla = _numero(cabeceras.get("sec-ch-viewport-width") or cabeceras.get("viewport-width"))
+    if ancho_pantalla:
+        densidad = _numero(cabeceras.get("sec-ch-dpr") or cabeceras.get("dpr")) or 1
+        cubren = [i for i, n in enumerate(nombres) if rendiciones[n]["ancho"] >= ancho_pantalla * densidad]
+        # Ninguna alcanza: la más grande
+        if cubren:
+            nombres = nombres[:cubren[0] + 1]
+
+    downlink = _numero(cabeceras.get("downlink"))
+    if downlink:
+        entran = [n for n in nombres if (rendiciones[n]["bitrate"] or 0) <= downlink * 1e6 * FRACCION_DOWNLINK]
+        nombres = entran or nombres[:1]
+    return nombres[-1]
+
+
+def ruta_rendicion(analisis_id: str, calidad, cabeceras):
+    """Video a servir: la rendición pedida (None si no existe) o la que eligen las client hints."""
+    rendiciones = rendiciones_disponibles(analisis_id)
+    if calidad:
+        if calidad == "original":
+            return ruta_video(analisis_id)
+        return ruta(rendiciones[calidad]["archivo"]) if calidad in rendiciones else None
+    if not rendiciones:
+        # Video de antes de las rendiciones
+        return ruta_video(analisis_id)
+    return ruta(rendiciones[elegir_rendicion(rendiciones, cabeceras)]["archivo"])
+
+
+def etag(path: str) -> str:
+    info = os.stat(path)
+    return f'"{os.path.basename(path)}-{info.st_size:x}-{info.st_mtime_ns:x}"'
+
+
+def moov_al_inicio(path: str) -> bool:
+    """Recorre las cajas de primer nivel del MP4 y dice si moov aparece antes que mdat."""
+    with open(path, "rb") as f:
+        while True:
+            cabecera = f.read(8)
+            if len(cabecera) < 8:
+                return False
+            tamano, tipo = struct.unpack(">I4s", cabecera)
+            if tipo == b"moov":
+                return True
+            if tipo == b"mdat" or tamano == 0:
+                return False
+            if tamano == 1:
+                # Caja de 64 bits: el tamaño real viene a continuación
+                tamano = struct.unpack(">Q", f.read(8))[0] - 8
+            f.seek(tamano - 8, os.SEEK_CUR)
+
+
+async def asegurar_faststart(path: str):
+    """Deja el moov al inicio del archivo si no lo estaba (una sola vez por video)."""
+    if path in _verificados:
+        return
+    async with _lock(path):
+        if path not in _verificados and not moov_al_inicio(path):
+            print(f"Reordenando {path} para reproducción progresiva")
+            temporal = path + ".faststart.mp4"
+            try:
+                await ejecutar("faststart", ["ffmpeg", "-y", "-loglevel", "error", "-i", path,
+                                             "-c", "copy", "-movflags", "+faststart", temporal])
+                os.replace(temporal, path)
+            finally:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+        _verificados.add(path)
+
+
+def nombre_playlist(analisis_id: str) -> str:
+    return f"{analisis_id}_hls.m3u8"
+
+
+# Archivos de un análisis que se sirven bajo /video/<id>/, con su tipo
+TIPOS_ARCHIVO = {
+    r"_hls_init\.mp4": "video/mp4",
+    r"_hls_\d+\.m4s": "video/mp4",
+    r"_(poster|pico|sprite)\.jpg": "image/jpeg",
+}
+
+
+def tipo_archivo(analisis_id: str, nombre: str):
+    """Tipo MIME de `nombre` si es un segmento HLS o una imagen del análisis; si no, None."""
+    for patron, tipo in TIPOS_ARCHIVO.items():
+        if re.fullmatch(re.escape(analisis_id) + patron, nombre):
+            return tipo
+    return None
+
+
+def _archivos_playlist(playlist: str) -> list:
+    with open(playlist, encoding="utf-8") as f:
+        texto = f.read()
+    archivos = re.findall(r'#EXT-X-MAP:URI="([^"]+)"', texto)
+    archivos += [linea for linea in texto.splitlines() if linea and not linea.startswith("#")]
+    return archivos
+
+
+def _hls_completo(playlist: str) -> bool:
+    # La limpieza de videos/ puede haber borrado algún segmento suelto
+    return os.path.exists(playlist) and all(os.path.exists(ruta(a)) for a in _archivos_playlist(playlist))
+
+
+async def preparar_hls(analisis_id: str):
+    """Ruta de la playlist HLS del análisis, generándola si hace falta; None si no hay video."""
+    video = ruta_video(analisis_id)
+    if video is None:
+        return None
+    playlist = ruta(nombre_playlist(analisis_id))
+    async with _lock(playlist):
+        if _hls_completo(playlist):
+            return playlist
+        print(f"Generando HLS de {analisis_id}")
+        # Cada archivo va a su subcarpeta (ver almacenamiento.py), pero ffmpeg los
+        # escribe todos juntos: se generan en una carpeta temporal y se mueven
+        with tempfile.TemporaryDirectory(dir=RAIZ) as temporal:
+            await ejecutar("hls", [
+                "ffmpeg", "-y", "-loglevel", "error", "-i", video,
+                "-c", "copy", "-f", "hls",
+                "-hls_time", str(SEGUNDOS_SEGMENTO_HLS),
+                "-hls_playlist_type", "vod",
+                "-hls_segment_type", "fmp4",
+                "-hls_fmp4_init_filename", f"{analisis_id}_hls_init.mp4",
+                "-hls_segment_filename", os.path.join(temporal, f"{analisis_id}_hls_%03d.m4s"),
+                os.path.join(temporal, nombre_playlist(analisis_id)),
+            ])
+            # La playlist se mueve al final: si existe, sus segmentos también
+            for nombre in sorted(os.listdir(temporal), key=lambda n: n.endswith(".m3u8")):
+                metricas.BYTES_ESCRITOS.inc(os.path.getsize(os.path.join(temporal, nombre)), tipo="hls")
+                os.replace(os.path.join(temporal, nombre), ruta(nombre))
+    return playlist
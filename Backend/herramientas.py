@@ -0,0 +1,115 @@
+# Ejecución de ffmpeg sin bloquear el event loop
+#
+# Los comandos se pasan como lista de argumentos (sin shell: el nombre de un
+# archivo subido nunca se interpreta) y corren con asyncio.create_subprocess_exec,
+# así mientras ffmpeg trabaja la API sigue atendiendo otros pedidos. Como mucho
+# corren MAXIMO_PROCESOS a la vez (uno por CPU, ffmpeg ya usa varios hilos) y
+# cada uno tiene un tiempo máximo: si se pasa se mata el proceso.
+#
+# Los errores salen como ErrorFFmpeg, con la operación, el código de salida y
+# lo que ffmpeg escribió en stderr, para responder al cliente sin adivinar.
+#
+# En los workers y el benchmark (sin event loop) se usa ejecutar_sincrono, que
+# corre ffmpeg con subprocess.run bajo un semáforo de hilos único por proceso:
+# así el límite vale entre todas las llamadas, no uno nuevo por llamada. Cada
+# worker del pool es un proceso aparte con su propio límite. La lectura y escritura de frames por pipes (LectorFFmpeg y
+# EscritorH264 en medios.py) no pasa por acá: son procesos de larga duración
+# que se alimentan frame a frame.
+import asyncio
+import os
+import subprocess
+import threading
+import time
+import weakref
+
+import metricas
+
+MAXIMO_PROCESOS = int(os.getenv("MAXIMO_PROCESOS_FFMPEG", os.cpu_count() or 1))
+# Segundos; las copias sin recodificar terminan en mucho menos
+TIEMPO_MAXIMO = float(os.getenv("TIEMPO_MAXIMO_FFMPEG", 600))
+
+# Un semáforo por event loop (asyncio no deja compartirlos entre loops)
+_semaforos = weakref.WeakKeyDictionary()
+# Límite de ejecutar_sincrono, compartido por todos los hilos del proceso
+_semaforo_sincrono = threading.BoundedSemaphore(MAXIMO_PROCESOS)
+
+
+class ErrorFFmpeg(RuntimeError):
+    def __init__(self, operacion: str, comando: list, codigo=None, stderr: str = "", expirado: bool = False):
+        self.operacion = operacion
+        self.comando = list(comando)
+        self.codigo = codigo
+        self.stderr = stderr.strip()
+        self.expirado = expirado
+        if expirado:
+            mensaje = f"ffmpeg ({operacion}) superó el tiempo máximo"
+        elif codigo is None:
+            mensaje = f"ffmpeg ({operacion}) no se pudo ejecutar"
+        else:
+            mensaje = f"ffmpeg ({operacion}) terminó con código {codigo}"
+        super().__init__(f"{mensaje}: {self.stderr}" if self.stderr else mensaje)
+
+
+def _semaforo() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaforo = _semaforos.get(loop)
+    if semaforo is None:
+        semaforo = _semaforos[loop] = asyncio.Semaphore(MAXIMO_PROCESOS)
+    return semaforo
+
+
+async def _terminar(proceso):
+    if proceso.returncode is None:
+        proceso.kill()
+        await proceso.wait()
+
+
+async def ejecutar(operacion: str, argumentos: list, tiempo_maximo: float = TIEMPO_MAXIMO) -> bytes:
+    """Corre `argumentos` (ffmpeg y sus opciones) y devuelve su stdout.
+
+    `operacion` nombra el uso (faststart, hls, ...) en los errores y en las métricas.
+    Lanza ErrorFFmpeg si el proceso falla o tarda más de `tiempo_maximo` segundos.
+    """
+    async with _semaforo():
+        inicio = time.perf_counter()
+        try:
+            proceso = await asyncio.create_subprocess_exec(
+                *argumentos,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError as e:
+            raise ErrorFFmpeg(operacion, argumentos, stderr=str(e))
+        try:
+            salida, errores = await asyncio.wait_for(proceso.communicate(), tiempo_maximo)
+        except asyncio.TimeoutError:
+            raise ErrorFFmpeg(operacion, argumentos, expirado=True)
+        finally:
+            # Si se cancela el pedido tampoco queda un ffmpeg suelto
+            await asyncio.shield(_terminar(proceso))
+            metricas.FFMPEG.observar(time.perf_counter() - inicio, operacion=operacion)
+
+    if proceso.returncode != 0:
+        raise ErrorFFmpeg(operacion, argumentos, proceso.returncode, errores.decode(errors="replace"))
+    return salida
+
+
+def ejecutar_sincrono(operacion: str, argumentos: list, tiempo_maximo: float = TIEMPO_MAXIMO) -> bytes:
+    """ejecutar() para código sin event loop (workers, scripts)."""
+    with _semaforo_sincrono:
+        inicio = time.perf_counter()
+        try:
+            # Si se pasa del tiempo, subprocess.run mata el proceso antes de lanzar
+            proceso = subprocess.run(argumentos, stdin=subprocess.DEVNULL, capture_output=True,
+                                     timeout=tiempo_maximo)
+        except subprocess.TimeoutExpired:
+            raise ErrorFFmpeg(operacion, argumentos, expirado=True)
+        except OSError as e:
+            raise ErrorFFmpeg(operacion, argumentos, stderr=str(e))
+        finally:
+            metricas.FFMPEG.observar(time.perf_counter() - inicio, operacion=operacion)
+
+    if proceso.returncode != 0:
+        raise ErrorFFmpeg(operacion, argumentos, proceso.returncode, proceso.stderr.decode(errors="replace"))
+    return proceso.stdout
@@ -7,22 +7,37 @@ from crud import verificar_login
 from database import engine, localSession
 from schemas import usuarioData, UsuarioCreate, PacienteCreate, Paciente,ArticulacionCreate, Articulacion,MovimientoCreate,MedicionCreate, Medicion,SesionCreate, Sesion
 from schemas import ProfesionalCreate, Profesional,ProfesionalWithUsuario,MedicionConSesionCompleta,PacienteUpdate,PacienteWithUsuarioUpdate
-from abduccion_video import abduccion_video
-from pys_video import pys_video
-from flexion_video import flexion_video
-import shutil
+from analisis import analizar, reanalizar, evaluar, reevaluar, mediciones_evaluacion
+from analisis import MOVIMIENTOS, MOVIMIENTOS_EVALUACION, VERSION_ANALIZADOR
+from movimientos import obtener_analizador
+from en_vivo import SesionEnVivo, MAXIMO_SESIONES_EN_VIVO
+from miniaturas import cargar_imagenes
+from motor import validar_lado
+from muestreo import PASO_POR_DEFECTO
+from medios import RESOLUCION_INFERENCIA, RESOLUCION_MINIMA, marca_subida
+import trabajos
+import cache_resultados
+import almacenamiento
+import entrega
+import herramientas
+import metricas
 import uuid
-import cv2
-import uuid
-import subprocess
 from typing import List
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import Form
+from fastapi import Form, Request, WebSocket
 from fastapi import UploadFile, File
 from models import Base
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response
+from starlette.requests import ClientDisconnect
+
 
+# Tamaño máximo de un video subido (bytes)
+TAMANO_MAXIMO_SUBIDA = int(os.getenv("TAMANO_MAXIMO_SUBIDA", 500 * 1024 ** 2))
 
 # Crear las tablas en la base de datos
 Base.metadata.create_all(bind=engine)
@@ -30,6 +45,18 @@ Base.metadata.create_all(bind=engine)
 # Crear la instancia de FastAPI
 app = FastAPI()
 
+@app.on_event("startup")
+def iniciar_workers():
+    # Arrancar los workers de análisis con MediaPipe ya cargado
+    trabajos.iniciar()
+    cache_resultados.cargar()
+    almacenamiento.iniciar(videos_referenciados, trabajos.archivos_en_curso)
+
+@app.on_event("shutdown")
+def detener_workers():
+    trabajos.detener()
+    almacenamiento.detener()
+
 # Montar carpeta 'img' para servir imágenes estáticas
 app.mount("/img", StaticFiles(directory=os.path.join(os.getcwd(), "img")), name="img")
 # Montar carpeta 'videos' para servir videos procesados
@@ -46,100 +73,426 @@ app.add_middleware(
     allow_headers=["*"],  # Permitir todos los encabezados
 )
 
-@app.post("/analizar_video/")
+def videos_referenciados():
+    # Para la limpieza de videos/: los de una medición guardada no se borran
+    db = localSession()
+    try:
+        return crud.get_videos_mediciones(db)
+    finally:
+        db.close()
+
+def nombre_movimiento(movimiento_id: int):
+    db = localSession()
+    try:
+        db_movimiento = crud.get_movimiento_by_id(db, movimiento_id)
+    finally:
+        db.close()
+    if db_movimiento is None:
+        raise HTTPException(status_code=404, detail="Movimiento no encontrado")
+    return db_movimiento.nombre
+
+async def resolver_movimiento(movimiento: str, movimiento_id: int):
+    if movimiento_id is not None:
+        # El id de la tabla movimiento manda sobre el nombre que mande el cliente
+        movimiento = await run_in_threadpool(nombre_movimiento, movimiento_id)
+    print(f"Movimiento: {movimiento}")
+    if not movimiento or movimiento.strip().lower() not in MOVIMIENTOS:
+        raise HTTPException(status_code=400, detail="Movimiento no reconocido")
+    return movimiento
+
+def lado_valido(lado: str) -> str:
+    # Se valida antes de guardar la subida: si no, el error recién aparece en el worker
+    try:
+        return validar_lado(lado)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def resolucion_valida(resolucion: int) -> int:
+    if resolucion != 0 and resolucion < RESOLUCION_MINIMA:
+        raise HTTPException(status_code=400,
+                            detail=f"La resolución debe ser 0 (original) o al menos {RESOLUCION_MINIMA} px")
+    return resolucion
+
+@app.post("/analizar_video/", status_code=202)
 async def analizar_video(
     file: UploadFile = File(...),
-    movimiento: str = Form(...),
+    movimiento: str = Form(None),
     lado: str = Form(...),
+    movimiento_id: int = Form(None),
+    paso: int = Form(PASO_POR_DEFECTO),
+    adaptativo: bool = Form(False),
+    resolucion: int = Form(RESOLUCION_INFERENCIA),
+    solo_angulos: bool = Form(False),
+    recorte: bool = Form(False),
+    solo_movimiento: bool = Form(False),
 ):
-    #print(f"Recibido archivo: {file.filename}, Tamaño: {len(await file.read())} bytes")
-    print(f"Movimiento: {movimiento}")
-    
-    # Guardar el video temporal
-    nombre_unico = f"{uuid.uuid4()}_{file.filename}"
-    original_path = os.path.join("videos", nombre_unico)
-    with open(original_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Convertir a mp4 si no es mp4 usando ffmpeg
-    ext = os.path.splitext(original_path)[1].lower()
-    if ext != ".mp4":
-        mp4_path = f"videos/{uuid.uuid4()}.mp4"
-        
-        try:
-            # Usar ffmpeg para convertir el video a mp4
-            subprocess.run(
-                f'ffmpeg -i "{original_path}" -vcodec libx264 -acodec aac "{mp4_path}"',
-                shell=True,
-                check=True,
-            )
-
-            os.remove(original_path)  # Eliminar el archivo original después de la conversión
-        except subprocess.CalledProcessError:
-            raise HTTPException(status_code=400, detail="Error al convertir el video.")
-    else:
-        mp4_path = original_path
-
-    # Elegir el modelo según el tipo de movimiento
-    if movimiento.lower() == "abducción":
-        print("Ejecutando modelo de Abducción")
-        resultado = abduccion_video(mp4_path,lado=lado)
-        original_output = resultado["output"]
-        final_output = original_output.replace("_output.mp4", "_final.mp4")
-
-        try:
-            subprocess.run(
-                f'ffmpeg -y -i "{original_output}" -vcodec libx264 -acodec aac "{final_output}"',
-                shell=True,
-                check=True,
-            )
-            resultado["output"] = final_output
-        except subprocess.CalledProcessError:
-            raise HTTPException(status_code=400, detail="Error al convertir el video procesado.")
-    elif movimiento.lower() == "pronación y supinación":
-        print("Ejecutando modelo de p y s")
-        print(f"Lado recibido: '{lado}'")  # <--- DEBUG
-        resultado = pys_video(mp4_path,lado=lado)
-        original_output = resultado["output"]
-        final_output = original_output.replace("_output.mp4", "_final.mp4")
-
-        try:
-            subprocess.run(
-                f'ffmpeg -y -i "{original_output}" -vcodec libx264 -acodec aac "{final_output}"',
-                shell=True,
-                check=True,
-            )
-            resultado["output"] = final_output
-        except subprocess.CalledProcessError:
-            raise HTTPException(status_code=400, detail="Error al convertir el video procesado.")
-    elif movimiento.lower() == "flexión":
-        print("Ejecutando modelo de flexion")
-        resultado = flexion_video(mp4_path,lado=lado)
-
-        original_output = resultado["output"]
-        final_output = original_output.replace("_output.mp4", "_final.mp4")
-
-        try:
-            subprocess.run(
-                f'ffmpeg -y -i "{original_output}" -vcodec libx264 -acodec aac "{final_output}"',
-                shell=True,
-                check=True,
-            )
-            resultado["output"] = final_output
-        except subprocess.CalledProcessError:
-            raise HTTPException(status_code=400, detail="Error al convertir el video procesado.")
-    else:
-        os.remove(mp4_path) 
-        raise HTTPException(status_code=400, detail="Movimiento no reconocido")
-
-    #os.remove(mp4_path)
-      # Eliminar archivos temporales
-    if os.path.exists(mp4_path) and mp4_path != final_output:
-        os.remove(mp4_path)
-    if os.path.exists(original_output) and original_output != final_output:
-        os.remove(original_output)
-    
-    return resultado
+    movimiento = await resolver_movimiento(movimiento, movimiento_id)
+    lado = lado_valido(lado)
+    resolucion = resolucion_valida(resolucion)
+    original_path, contenido_hash = await guardar_subida(file)
+
+    datos = {"movimiento": movimiento, "lado": lado}
+    opciones = {"paso": paso, "adaptativo": adaptativo, "resolucion": resolucion, "solo_angulos": solo_angulos,
+                "recorte": recorte, "solo_movimiento": solo_movimiento}
+    clave = cache_resultados.clave(contenido_hash, movimiento, lado, VERSION_ANALIZADOR, **opciones)
+    return encolar_analisis(analizar, original_path, movimiento, lado,
+                            datos=datos, clave=clave, opciones=opciones)
+
+@app.post("/evaluar_video/", status_code=202)
+async def evaluar_video(
+    file: UploadFile = File(...),
+    movimientos: str = Form(",".join(MOVIMIENTOS_EVALUACION)),
+    lados: str = Form("izquierda,derecha"),
+    paso: int = Form(PASO_POR_DEFECTO),
+    adaptativo: bool = Form(False),
+    resolucion: int = Form(RESOLUCION_INFERENCIA),
+    solo_angulos: bool = Form(False),
+    recorte: bool = Form(False),
+    solo_movimiento: bool = Form(False),
+):
+    # Varios movimientos y ambos lados con una sola inferencia (listas separadas por coma)
+    movimientos = [m.strip().lower() for m in movimientos.split(",") if m.strip()]
+    lados = [l.strip().lower() for l in lados.split(",") if l.strip()]
+    try:
+        mediciones_evaluacion(movimientos, lados)
+        for lado in lados:
+            validar_lado(lado)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    resolucion = resolucion_valida(resolucion)
+
+    original_path, contenido_hash = await guardar_subida(file)
+
+    datos = {"movimientos": movimientos, "lados": lados}
+    opciones = {"paso": paso, "adaptativo": adaptativo, "resolucion": resolucion, "solo_angulos": solo_angulos,
+                "recorte": recorte, "solo_movimiento": solo_movimiento}
+    clave = cache_resultados.clave(contenido_hash, ",".join(movimientos), ",".join(lados),
+                                   VERSION_ANALIZADOR, **opciones)
+    return encolar_analisis(evaluar, original_path, movimientos, lados,
+                            datos=datos, clave=clave, opciones=opciones)
+
+@app.post("/analizar_video/stream", status_code=202)
+async def analizar_video_stream(
+    request: Request,
+    lado: str,
+    movimiento: str = None,
+    movimiento_id: int = None,
+    nombre: str = "video",
+    paso: int = PASO_POR_DEFECTO,
+    adaptativo: bool = False,
+    resolucion: int = RESOLUCION_INFERENCIA,
+    solo_angulos: bool = False,
+    recorte: bool = False,
+    solo_movimiento: bool = False,
+):
+    # El cuerpo es el video crudo (no multipart) y las opciones van en la URL.
+    # El análisis arranca antes de recibir el video completo: el worker lo
+    # decodifica a medida que se escribe (ver medios.abrir_video)
+    movimiento = await resolver_movimiento(movimiento, movimiento_id)
+    lado = lado_valido(lado)
+    resolucion = resolucion_valida(resolucion)
+    largo = request.headers.get("content-length")
+    if largo and largo.isdigit() and int(largo) > TAMANO_MAXIMO_SUBIDA:
+        raise HTTPException(status_code=413, detail="El video supera el tamaño máximo permitido")
+
+    original_path = ruta_subida(nombre)
+    marca = marca_subida(original_path)
+    open(marca, "w").close()
+    archivo = open(original_path, "wb", buffering=0)
+
+    # El hash recién se conoce al final: el resultado se guarda en caché para
+    # futuras subidas del mismo video, pero esta no se puede deduplicar
+    datos = {"movimiento": movimiento, "lado": lado}
+    opciones = {"paso": paso, "adaptativo": adaptativo, "resolucion": resolucion, "solo_angulos": solo_angulos,
+                "recorte": recorte, "solo_movimiento": solo_movimiento}
+    clave = {}
+
+    def al_completar(resultado):
+        if "clave" in clave:
+            cache_resultados.guardar(clave["clave"], resultado)
+
+    job_id = trabajos.crear_trabajo(analizar, original_path, movimiento, lado,
+                                    datos=datos, al_completar=al_completar, **opciones)
+
+    contenido_hash = cache_resultados.nuevo_hash()
+    recibidos = 0
+    try:
+        async for bloque in request.stream():
+            recibidos += len(bloque)
+            if recibidos > TAMANO_MAXIMO_SUBIDA:
+                raise HTTPException(status_code=413, detail="El video supera el tamaño máximo permitido")
+            contenido_hash.update(bloque)
+            await run_in_threadpool(archivo.write, bloque)
+            contar_subida(len(bloque))
+    except BaseException as e:
+        # Sin el archivo el worker da la subida por interrumpida y corta el análisis
+        archivo.close()
+        for path in (original_path, marca):
+            if os.path.exists(path):
+                os.remove(path)
+        if isinstance(e, ClientDisconnect):
+            print(f"Subida cancelada por el cliente: {original_path}")
+            # Nadie va a leer la respuesta, pero no puede ser un 202 sin cuerpo
+            raise HTTPException(status_code=400, detail="Subida cancelada por el cliente")
+        raise
+    archivo.close()
+    # La clave va antes de quitar la marca: sin la marca el worker termina de
+    # leer y, con un clip corto, al_completar puede correr enseguida
+    clave["clave"] = cache_resultados.clave(contenido_hash.hexdigest(), movimiento, lado,
+                                            VERSION_ANALIZADOR, **opciones)
+    os.remove(marca)
+    return {"job_id": job_id, "estado": trabajos.obtener_estado(job_id)["estado"]}
+
+def contar_subida(bytes_recibidos: int):
+    metricas.BYTES_SUBIDOS.inc(bytes_recibidos)
+    metricas.BYTES_ESCRITOS.inc(bytes_recibidos, tipo="subida")
+
+def ruta_subida(nombre: str) -> str:
+    nombre_unico = f"{uuid.uuid4()}_{os.path.basename(nombre or 'video')}"
+    return almacenamiento.ruta(nombre_unico)
+
+async def guardar_subida(file: UploadFile):
+    # Guardar el video temporal sin bloquear el event loop, calculando su hash mientras se escribe
+    original_path = ruta_subida(file.filename)
+
+    def guardar():
+        contenido_hash = cache_resultados.nuevo_hash()
+        recibidos = 0
+        with open(original_path, "wb") as buffer:
+            while bloque := file.file.read(1024 * 1024):
+                recibidos += len(bloque)
+                if recibidos > TAMANO_MAXIMO_SUBIDA:
+                    break
+                contenido_hash.update(bloque)
+                buffer.write(bloque)
+                contar_subida(len(bloque))
+        if recibidos > TAMANO_MAXIMO_SUBIDA:
+            os.remove(original_path)
+            raise HTTPException(status_code=413, detail="El video supera el tamaño máximo permitido")
+        return contenido_hash.hexdigest()
+
+    return original_path, await run_in_threadpool(guardar)
+
+def encolar_analisis(funcion, original_path, *args, datos, clave, opciones):
+    # Mismo video y opciones: se responde con lo que ya existe en vez de procesarlo otra vez
+    resultado = cache_resultados.obtener(clave)
+    en_curso = trabajos.buscar_en_curso(clave) if resultado is None else None
+    metricas.CACHE.inc(resultado="acierto" if resultado is not None else
+                       "en_curso" if en_curso is not None else "fallo")
+    if resultado is not None or en_curso is not None:
+        os.remove(original_path)
+        if resultado is not None:
+            job_id = trabajos.crear_trabajo_completado(resultado, datos=datos)
+            return {"job_id": job_id, "estado": "completado"}
+        return {"job_id": en_curso, "estado": trabajos.obtener_estado(en_curso)["estado"]}
+
+    # El análisis corre en segundo plano; el cliente consulta /analisis/{job_id}
+    job_id = trabajos.crear_trabajo(
+        funcion, original_path, *args,
+        datos=datos, clave=clave,
+        al_completar=lambda resultado: cache_resultados.guardar(clave, resultado),
+        **opciones,
+    )
+    return {"job_id": job_id, "estado": "pendiente"}
+
+@app.get("/analisis/{job_id}")
+def estado_analisis(job_id: str):
+    estado = trabajos.obtener_estado(job_id)
+    if not estado:
+        raise HTTPException(status_code=404, detail="Análisis no encontrado")
+    return estado
+
+@app.get("/analisis/{job_id}/resultado")
+def resultado_analisis(job_id: str):
+    estado = trabajos.obtener_estado(job_id)
+    if not estado:
+        raise HTTPException(status_code=404, detail="Análisis no encontrado")
+    if estado["estado"] == "error":
+        raise HTTPException(status_code=400, detail=estado["detalle"])
+    if estado["estado"] != "completado":
+        raise HTTPException(status_code=409, detail="El análisis aún no termina")
+    return trabajos.obtener_resultado(job_id)
+
+@app.post("/reanalizar/")
+def reanalizar_video(data: schemas.ReanalisisRequest):
+    # Recalcula con otro lado o movimiento usando los landmarks guardados, sin volver a subir el video
+    try:
+        return reanalizar(data.pistas, data.movimiento, data.lado)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No hay pistas guardadas para ese análisis")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/reevaluar/")
+def reevaluar_video(data: schemas.ReevaluacionRequest):
+    try:
+        return reevaluar(data.pistas, [m.lower() for m in data.movimientos], [l.lower() for l in data.lados])
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No hay pistas guardadas para ese análisis")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Los archivos de un análisis no cambian: el navegador los puede guardar un año
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+
+def servir_archivo(request: Request, path: str, media_type: str, cache_control: str = CACHE_INMUTABLE,
+                   extra: dict = None):
+    # FileResponse atiende los Range; acá se agregan el ETag fuerte y el 304
+    etiqueta = entrega.etag(path)
+    cabeceras = {"ETag": etiqueta, "Cache-Control": cache_control, **(extra or {})}
+    pedidas = [e.strip() for e in request.headers.get("if-none-match", "").split(",")]
+    if etiqueta in pedidas or "*" in pedidas:
+        return Response(status_code=304, headers=cabeceras)
+    almacenamiento.tocar(path)
+    return FileResponse(path, media_type=media_type, headers=cabeceras)
+
+def id_de_video(analisis_id: str) -> str:
+    try:
+        return entrega.validar_id(analisis_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Video no encontrado")
+
+def error_ffmpeg(mensaje: str, e: herramientas.ErrorFFmpeg) -> HTTPException:
+    # 504 si ffmpeg no terminó a tiempo: se puede volver a intentar
+    return HTTPException(status_code=504 if e.expirado else 500, detail=f"{mensaje}: {e}")
+
+@app.get("/video/{analisis_id}")
+async def servir_video(analisis_id: str, request: Request, calidad: str = None):
+    # Video anotado de un análisis, listo para reproducción progresiva. Sin
+    # `calidad` se elige la rendición según las client hints (ver entrega.py)
+    path = entrega.ruta_rendicion(id_de_video(analisis_id), calidad, request.headers)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Video no encontrado")
+    try:
+        await entrega.asegurar_faststart(path)
+    except herramientas.ErrorFFmpeg as e:
+        raise error_ffmpeg("No se pudo preparar el video", e)
+    pistas_cliente = ", ".join(entrega.PISTAS_CLIENTE)
+    extra = {"Accept-CH": pistas_cliente}
+    if not calidad:
+        extra["Vary"] = pistas_cliente
+    return servir_archivo(request, path, "video/mp4", extra=extra)
+
+@app.get("/video/{analisis_id}/hls")
+async def servir_playlist_hls(analisis_id: str, request: Request):
+    # Playlist HLS (segmentos fMP4); se genera la primera vez que se pide
+    try:
+        playlist = await entrega.preparar_hls(id_de_video(analisis_id))
+    except herramientas.ErrorFFmpeg as e:
+        raise error_ffmpeg("No se pudo generar el HLS", e)
+    if playlist is None:
+        raise HTTPException(status_code=404, detail="Video no encontrado")
+    # La playlist se puede regenerar: se revalida con el ETag en cada uso
+    return servir_archivo(request, playlist, "application/vnd.apple.mpegurl", "no-cache")
+
+@app.get("/video/{analisis_id}/{archivo}")
+async def servir_archivo_video(analisis_id: str, archivo: str, request: Request):
+    # Segmentos HLS e imágenes (poster, pico, sprite) del análisis
+    tipo = entrega.tipo_archivo(id_de_video(analisis_id), archivo)
+    if tipo is None or not os.path.exists(almacenamiento.ruta(archivo)):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return servir_archivo(request, almacenamiento.ruta(archivo), tipo)
+
+# Conexiones de medición en vivo abiertas
+sesiones_en_vivo = set()
+
+@app.websocket("/ws/angulos")
+async def angulos_en_vivo(
+    websocket: WebSocket,
+    lado: str,
+    movimiento: str = None,
+    movimiento_id: int = None,
+    resolucion: int = RESOLUCION_INFERENCIA,
+):
+    # Cada mensaje binario es un frame (JPEG o WebP) y se responde con su ángulo,
+    # el rango acumulado y la latencia. El texto "fin" cierra la sesión con el
+    # resultado final. Si llegan frames más rápido de lo que se procesan se
+    # mide solo el último, para que la respuesta no se atrase respecto de la cámara
+    await websocket.accept()
+    try:
+        movimiento = await resolver_movimiento(movimiento, movimiento_id)
+        analizador = obtener_analizador(movimiento)
+        lado = validar_lado(lado)
+        resolucion = resolucion_valida(resolucion)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    if len(sesiones_en_vivo) >= MAXIMO_SESIONES_EN_VIVO:
+        await websocket.close(code=1013, reason="Demasiadas mediciones en vivo, intente más tarde")
+        return
+
+    sesiones_en_vivo.add(websocket)
+    loop = asyncio.get_running_loop()
+    # Un solo hilo por conexión: el grafo de MediaPipe se usa siempre desde el mismo
+    hilo = ThreadPoolExecutor(max_workers=1)
+    sesion = None
+    ultimo = {"datos": None, "descartados": 0}
+    hay_frame = asyncio.Event()
+
+    async def recibir():
+        while True:
+            mensaje = await websocket.receive()
+            if mensaje["type"] == "websocket.disconnect":
+                return "desconectado"
+            if mensaje.get("bytes") is not None:
+                if ultimo["datos"] is not None:
+                    ultimo["descartados"] += 1
+                ultimo["datos"] = mensaje["bytes"]
+                hay_frame.set()
+            elif mensaje.get("text") == "fin":
+                return "fin"
+
+    receptor = asyncio.create_task(recibir())
+    try:
+        sesion = await loop.run_in_executor(hilo, SesionEnVivo, analizador, lado, resolucion)
+        while True:
+            if receptor.done() and (receptor.result() != "fin" or ultimo["datos"] is None):
+                break
+            if ultimo["datos"] is None:
+                espera = asyncio.create_task(hay_frame.wait())
+                await asyncio.wait({receptor, espera}, return_when=asyncio.FIRST_COMPLETED)
+                espera.cancel()
+                continue
+
+            datos, ultimo["datos"] = ultimo["datos"], None
+            hay_frame.clear()
+            try:
+                respuesta = await loop.run_in_executor(hilo, sesion.procesar, datos)
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+            metricas.FRAMES_EN_VIVO.observar(respuesta["latencia_ms"]["total"] / 1000)
+            respuesta["descartados"] = ultimo["descartados"]
+            await websocket.send_json(respuesta)
+
+        if receptor.result() == "fin":
+            resumen = await loop.run_in_executor(hilo, sesion.resumen)
+            await websocket.send_json({"resumen": resumen})
+            await websocket.close()
+        else:
+            print(f"Medición en vivo cortada por el cliente ({movimiento} {lado})")
+    finally:
+        # Sin await: si la conexión se cancela igual se libera el modelo (en su hilo)
+        receptor.cancel()
+        if sesion is not None:
+            hilo.submit(sesion.cerrar)
+        hilo.shutdown(wait=False)
+        sesiones_en_vivo.discard(websocket)
+
+# Medidores que se calculan al pedir /metrics
+metricas.Medidor("analisis_trabajos_en_curso", "Análisis pendientes o procesándose", ["estado"],
+                 funcion=trabajos.contar_en_curso)
+metricas.Medidor("en_vivo_sesiones", "Mediciones en vivo abiertas", funcion=lambda: len(sesiones_en_vivo))
+metricas.Medidor("videos_bytes", "Bytes en videos/ según la última limpieza",
+                 funcion=lambda: almacenamiento.ultima_limpieza.get("bytes"))
+
+@app.get("/metrics")
+def exponer_metricas():
+    # Formato de texto de Prometheus (ver metricas.py)
+    return Response(metricas.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Función para obtener una sesión de base de datos
 def get_db():
@@ -386,14 +739,21 @@ def crear_sesion_con_medicion(data: schemas.SesionWithMedicion, db: Session = De
         "medicion": result["medicion"]
     }
 
+def con_imagenes(medicion: dict) -> dict:
+    # Poster, pico y sprite del video de la medición (ver miniaturas.py), para
+    # que el historial muestre imágenes en vez de cargar los videos
+    if medicion.get("video"):
+        medicion["imagenes"] = cargar_imagenes(almacenamiento.id_analisis(medicion["video"]))
+    return medicion
+
 @app.get("/medicion_completa/{medicion_id}", response_model=MedicionConSesionCompleta)
 def obtener_medicion_completa(medicion_id: int, db: Session = Depends(get_db)):
     resultado = crud.get_medicion_completa(db, medicion_id)
     if not resultado:
         raise HTTPException(status_code=404, detail="Medición o datos relacionados no encontrados")
-    return resultado
+    return con_imagenes(resultado)
 
 @app.get("/mediciones_completas_paciente/{paciente_id}", response_model=List[MedicionConSesionCompleta])
 def get_mediciones_por_paciente_completas(paciente_id: int, db: Session = Depends(get_db)):
     resultados = crud.get_mediciones_por_paciente_completas(db, paciente_id)
-    return resultados
+    return [con_imagenes(resultado) for resultado in resultados]
@@ -0,0 +1,436 @@
+# Utilidades de entrada/salida de video
+import collections
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from almacenamiento import ruta
+from herramientas import ErrorFFmpeg, ejecutar_sincrono
+
+# Parámetros del codificador H.264 de los videos procesados
+PRESET_H264 = "veryfast"
+CRF_H264 = 23
+# Segundos entre keyframes: al buscar, el navegador salta al keyframe anterior
+# y los segmentos HLS (ver entrega.py) solo se pueden cortar en ellos
+INTERVALO_KEYFRAMES = 2
+
+# Versiones del video anotado que se codifican en la misma pasada, con su lado
+# corto (px; 0 = resolución original, así un video vertical también queda en
+# 360p), preset y CRF de x264. "original" es <id>_final.mp4, el archivo que se
+# guarda con la medición; las demás son <id>_<nombre>_final.mp4 y se saltan si
+# el video ya es más chico. /video/<id> elige entre ellas (ver entrega.py)
+RENDICIONES = {
+    "original": {"lado_corto": 0, "preset": PRESET_H264, "crf": CRF_H264},
+    "360p": {"lado_corto": 360, "preset": "veryfast", "crf": 28},
+}
+
+# Los WebM de MediaRecorder no traen un fps fijo en la cabecera y OpenCV
+# devuelve 0 o la base de tiempo (1000); en ese caso se asume este valor
+FPS_POR_DEFECTO = 30.0
+FPS_MAXIMO = 240.0
+
+# Lado largo (px) de la imagen que se entrega a MediaPipe; 0 = resolución original.
+# Reducir es más rápido pero cambia los ángulos: en el clip de referencia
+# (benchmarks/corpus/flexion_referencia.mp4, flexión derecha) a 640 px el mínimo
+# pasa de 40.8° a 60.5° y hay frames que difieren en más de 90°. Por eso por
+# defecto se infiere a resolución original y reducir es opcional (?resolucion=640);
+# solo puede ser el valor por defecto si benchmark.py muestra que los ángulos no cambian
+RESOLUCION_INFERENCIA = 0
+# Menos que esto ya no deja ver las articulaciones (y 0 sigue valiendo como original)
+RESOLUCION_MINIMA = 160
+
+# Subidas en streaming: mientras exista <video>.subiendo el archivo sigue creciendo
+EXTENSION_SUBIENDO = ".subiendo"
+# Segundos sin datos nuevos tras los cuales se da la subida por perdida
+ESPERA_MAXIMA_SUBIDA = 60.0
+# Segundos para recodificar una entrada que OpenCV no lee (puede ser larga y en 4K)
+TIEMPO_MAXIMO_TRANSCODIFICACION = 1800
+
+
+def imagen_para_inferencia(frame: np.ndarray, lado_largo: int = RESOLUCION_INFERENCIA) -> np.ndarray:
+    """Reduce el frame manteniendo la proporción y lo pasa a RGB para MediaPipe.
+
+    MediaPipe devuelve landmarks normalizados a [0, 1] respecto de la imagen que
+    recibe; como la proporción no cambia, esas coordenadas valen igual para el
+    frame original y el dibujo se sigue haciendo a resolución completa.
+    """
+    alto, ancho = frame.shape[:2]
+    if lado_largo and max(alto, ancho) > lado_largo:
+        escala = lado_largo / max(alto, ancho)
+        # Se reduce antes de convertir el color: la conversión trabaja sobre menos píxeles
+        frame = cv2.resize(frame, (round(ancho * escala), round(alto * escala)),
+                           interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def _fps_valido(fps) -> float:
+    if not fps or fps <= 0 or fps > FPS_MAXIMO:
+        return FPS_POR_DEFECTO
+    return fps
+
+
+def abrir_video(path: str):
+    """Abre el video tal como se subió (MP4, WebM VP8/VP9, ...) y devuelve (cap, fps, size).
+
+    Si el archivo todavía se está subiendo (ver marca_subida) se decodifica con
+    ffmpeg a medida que llegan los datos. Los MP4 con el índice (moov) al final
+    no se pueden leer así; para esos se espera a que termine la subida.
+    """
+    if subida_en_curso(path):
+        lector = LectorFFmpeg(path, SubidaEnCurso(path))
+        if lector.isOpened():
+            return lector, lector.fps, lector.size
+        lector.release()
+        print(f"{path} no se puede decodificar mientras se sube, esperando el archivo completo")
+        esperar_subida(path)
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened() and os.path.exists(path):
+        # Contenedor que OpenCV no entiende: ffmpeg lo decodifica igual
+        cap.release()
+        lector = LectorFFmpeg(path)
+        if not lector.isOpened():
+            lector.release()
+            raise RuntimeError(f"No se pudo leer el video: {' '.join(map(str, lector.errores))}")
+        return lector, lector.fps, lector.size
+
+    fps = _fps_valido(cap.get(cv2.CAP_PROP_FPS))
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    return cap, fps, size
+
+
+def marca_subida(path: str) -> str:
+    return path + EXTENSION_SUBIENDO
+
+
+def subida_en_curso(path: str) -> bool:
+    return os.path.exists(marca_subida(path))
+
+
+def esperar_subida(path: str):
+    """Bloquea hasta que la subida termina; falla si se interrumpió o dejó de llegar."""
+    with SubidaEnCurso(path) as subida:
+        while subida.read(1024 * 1024):
+            pass
+
+
+class SubidaEnCurso:
+    """Lee un archivo que se sigue escribiendo: al llegar al final espera más datos.
+
+    El final real es cuando desaparece la marca .subiendo. Si también desaparece
+    el archivo, la subida se canceló (cliente desconectado, tamaño máximo).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.archivo = open(path, "rb")
+        self.cancelada = False
+
+    def read(self, n: int) -> bytes:
+        ultimo_dato = time.monotonic()
+        while not self.cancelada:
+            datos = self.archivo.read(n)
+            if datos:
+                return datos
+            if not subida_en_curso(self.path):
+                if not os.path.exists(self.path):
+                    raise RuntimeError("La subida del video se interrumpió")
+                # La marca se borra después del último write: lo que falte ya está en disco
+                return self.archivo.read(n)
+            if time.monotonic() - ultimo_dato > ESPERA_MAXIMA_SUBIDA:
+                raise RuntimeError("La subida del video dejó de recibir datos")
+            time.sleep(0.05)
+        return b""
+
+    def close(self):
+        self.archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LectorFFmpeg:
+    """Decodifica con ffmpeg a frames BGR crudos, con la interfaz de cv2.VideoCapture.
+
+    Con `subida` (SubidaEnCurso) los bytes se pasan a ffmpeg por stdin a medida
+    que llegan; si no, ffmpeg lee el archivo directamente. El tamaño y el fps se
+    toman de lo que ffmpeg informa al abrir el video; isOpened() es False si no
+    pudo abrirlo.
+    """
+
+    def __init__(self, path: str, subida: SubidaEnCurso = None):
+        self.path = path
+        self.subida = subida
+        self.size = None
+        self.fps = FPS_POR_DEFECTO
+        self.errores = []
+        self._abierto = threading.Event()
+        comando = [
+            "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "info",
+            "-i", "pipe:0" if subida else path,
+            "-an", "-f", "rawvideo", "-pix_fmt", "bgr24",
+            # Un frame de salida por frame decodificado, como cv2.VideoCapture
+            "-vsync", "passthrough",
+            "pipe:1",
+        ]
+        self.proceso = subprocess.Popen(
+            comando,
+            stdin=subprocess.PIPE if subida else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._hilos = [threading.Thread(target=self._leer_info, daemon=True)]
+        if subida:
+            self._hilos.append(threading.Thread(target=self._alimentar, daemon=True))
+        for hilo in self._hilos:
+            hilo.start()
+        self._abierto.wait()
+
+    def _alimentar(self):
+        try:
+            while bloque := self.subida.read(256 * 1024):
+                self.proceso.stdin.write(bloque)
+        except (BrokenPipeError, ValueError):
+            pass  # ffmpeg terminó antes (error o release)
+        except Exception as e:
+            self.errores.append(e)
+        finally:
+            try:
+                self.proceso.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def _leer_info(self):
+        # ffmpeg escribe en stderr la descripción de la entrada y de la salida;
+        # hay que leerlo siempre para que no se bloquee con el buffer lleno
+        seccion = None
+        for linea in iter(self.proceso.stderr.readline, b""):
+            linea = linea.decode(errors="replace")
+            if linea.startswith("Input #0"):
+                seccion = "entrada"
+            elif linea.startswith("Output #0"):
+                seccion = "salida"
+            elif "Video:" in linea and seccion == "entrada":
+                fps = re.search(r"([\d.]+) fps", linea)
+                self.fps = _fps_valido(float(fps.group(1)) if fps else None)
+            elif "Video:" in linea and seccion == "salida" and self.size is None:
+                # El tamaño de salida se mantiene aunque el video cambie de resolución (-autoscale)
+                tamano = re.search(r", (\d+)x(\d+)", linea)
+                if tamano:
+                    self.size = (int(tamano.group(1)), int(tamano.group(2)))
+                    self._abierto.set()
+            elif "rror" in linea:
+                self.errores.append(linea.strip())
+        self._abierto.set()
+
+    def isOpened(self) -> bool:
+        return self.size is not None and self.proceso.stdout is not None
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        width, height = self.size
+        buffer = bytearray(width * height * 3)
+        vista = memoryview(buffer)
+        leidos = 0
+        while leidos < len(buffer):
+            n = self.proceso.stdout.readinto(vista[leidos:])
+            if not n:
+                return False, None
+            leidos += n
+        return True, np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+
+    def get(self, propiedad):
+        if propiedad == cv2.CAP_PROP_FPS:
+            return self.fps
+        if self.size and propiedad == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.size[0]
+        if self.size and propiedad == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.size[1]
+        return 0  # cantidad de frames desconocida en un stream
+
+    def release(self):
+        if self.subida:
+            self.subida.cancelada = True
+        if self.proceso.poll() is None:
+            self.proceso.kill()
+        self.proceso.wait()
+        for hilo in self._hilos:
+            hilo.join()
+        self.proceso.stdout.close()
+        self.proceso.stderr.close()
+        if self.subida:
+            self.subida.close()
+        if self.errores and isinstance(self.errores[0], Exception):
+            raise self.errores[0]
+
+
+def se_puede_decodificar(path: str) -> bool:
+    # Basta con leer un frame para saber si OpenCV entiende el contenedor y el códec
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return False
+        ret, frame = cap.read()
+        return ret and frame is not None
+    finally:
+        cap.release()
+
+
+def transcodificar_mp4(origen: str, destino: str):
+    """Último recurso para entradas que OpenCV no puede leer directamente."""
+    try:
+        ejecutar_sincrono("transcodificacion", ["ffmpeg", "-y", "-loglevel", "error", "-i", origen,
+                                                "-an", "-c:v", "libx264", "-preset", PRESET_H264, destino],
+                          TIEMPO_MAXIMO_TRANSCODIFICACION)
+    except ErrorFFmpeg as e:
+        raise RuntimeError(f"Error al convertir el video: {e.stderr or e}")
+
+
+def _par(valor: float) -> int:
+    # yuv420p exige dimensiones pares
+    return max(2, 2 * round(valor / 2))
+
+
+def nombre_rendicion(analisis_id: str, nombre: str) -> str:
+    if nombre == "original":
+        return f"{analisis_id}_final.mp4"
+    return f"{analisis_id}_{nombre}_final.mp4"
+
+
+def _salidas(analisis_id: str, size: tuple, rendiciones: dict) -> dict:
+    """Rendiciones que tiene sentido generar para un video de tamaño `size`, con su tamaño."""
+    width, height = size
+    salidas = {}
+    for nombre, rendicion in rendiciones.items():
+        lado_corto = rendicion["lado_corto"]
+        if nombre == "original":
+            # El original solo se completa (pad) hasta un tamaño par
+            ancho, alto = width + width % 2, height + height % 2
+        elif lado_corto and lado_corto < min(width, height):
+            escala = lado_corto / min(width, height)
+            ancho, alto = _par(width * escala), _par(height * escala)
+        else:
+            continue
+        salidas[nombre] = dict(rendicion, archivo=nombre_rendicion(analisis_id, nombre),
+                               ancho=ancho, alto=alto)
+    return salidas
+
+
+class EscritorH264:
+    """Codifica frames BGR directo a MP4 H.264 reproducibles en el navegador.
+
+    Los frames se envían crudos por stdin a un único proceso ffmpeg, sin archivo
+    intermedio ni segunda pasada. ffmpeg los reparte (split) entre un codificador
+    por rendición (ver RENDICIONES), que corren en paralelo: cada frame se
+    decodifica y se escribe por el pipe una sola vez. Tiene la misma interfaz que
+    cv2.VideoWriter (write / release) para poder reemplazarlo sin tocar el resto
+    del análisis.
+    """
+
+    def __init__(self, analisis_id: str, fps: float, size: tuple, rendiciones: dict = RENDICIONES):
+        width, height = size
+        self.size = (width, height)
+        self.fps = fps
+        self.frames = 0
+        self.salidas = _salidas(analisis_id, size, rendiciones)
+        self.path = ruta(self.salidas["original"]["archivo"])
+
+        etiquetas = [f"[v{i}]" for i in range(len(self.salidas))]
+        filtros = ["[0:v]pad=ceil(iw/2)*2:ceil(ih/2)*2,split=" + str(len(etiquetas)) + "".join(etiquetas)]
+        comando = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}", "-r", f"{fps:.3f}",
+            "-i", "-",
+        ]
+        salidas = []
+        for i, (nombre, salida) in enumerate(self.salidas.items()):
+            etiqueta = etiquetas[i]
+            if nombre != "original":
+                filtros.append(f"{etiqueta}scale={salida['ancho']}:{salida['alto']}[e{i}]")
+                etiqueta = f"[e{i}]"
+            salidas += [
+                "-map", etiqueta, "-an",
+                "-c:v", "libx264", "-preset", salida["preset"], "-crf", str(salida["crf"]),
+                "-g", str(max(1, round(fps * INTERVALO_KEYFRAMES))),
+                "-pix_fmt", "yuv420p",
+                # moov al inicio: el navegador puede empezar a reproducir sin descargar todo
+                "-movflags", "+faststart",
+                ruta(salida["archivo"]),
+            ]
+        comando += ["-filter_complex", ";".join(filtros)] + salidas
+        self.proceso = subprocess.Popen(comando, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.errores = collections.deque(maxlen=50)
+        self._hilo_errores = threading.Thread(target=self._leer_errores, daemon=True)
+        self._hilo_errores.start()
+
+    def _leer_errores(self):
+        # Como en LectorFFmpeg: si nadie lee stderr, ffmpeg se bloquea con el buffer lleno
+        for linea in iter(self.proceso.stderr.readline, b""):
+            self.errores.append(linea.decode(errors="replace").strip())
+
+    def write(self, frame: np.ndarray):
+        # MediaRecorder puede cambiar la resolución a mitad de la grabación;
+        # ffmpeg espera siempre frames del tamaño declarado
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size)
+        try:
+            self.proceso.stdin.write(np.ascontiguousarray(frame).data)
+            self.frames += 1
+        except BrokenPipeError:
+            self.release()
+
+    def release(self):
+        if self.proceso.returncode is not None:
+            # Ya cerrado (write lo cierra si ffmpeg se cae): el error ya se informó
+            return
+        if self.proceso.stdin and not self.proceso.stdin.closed:
+            try:
+                self.proceso.stdin.close()
+            except BrokenPipeError:
+                pass
+        codigo = self.proceso.wait()
+        self._hilo_errores.join()
+        self.proceso.stderr.close()
+        if codigo != 0:
+            raise RuntimeError(f"ffmpeg no pudo codificar {self.path}: {' '.join(self.errores)}")
+
+    def rendiciones(self) -> dict:
+        """Archivo, tamaño y bitrate (bits/s) de cada rendición, ya cerrado el proceso."""
+        segundos = self.frames / self.fps if self.frames else 0
+        rendiciones = {}
+        for nombre, salida in self.salidas.items():
+            path = ruta(salida["archivo"])
+            if not os.path.exists(path):
+                continue
+            rendiciones[nombre] = {
+                "archivo": salida["archivo"],
+                "ancho": salida["ancho"],
+                "alto": salida["alto"],
+                "bitrate": round(os.path.getsize(path) * 8 / segundos) if segundos else None,
+            }
+        return rendiciones
+
+
+def guardar_rendiciones(analisis_id: str, rendiciones: dict):
+    with open(ruta(f"{analisis_id}_rendiciones.json"), "w", encoding="utf-8") as f:
+        json.dump(rendiciones, f)
+
+
+def cargar_rendiciones(analisis_id: str):
+    """Rendiciones guardadas de un análisis, o None (videos de antes, o ya borradas)."""
+    try:
+        with open(ruta(f"{analisis_id}_rendiciones.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
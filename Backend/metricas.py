@@ -0,0 +1,185 @@
+# Métricas de la API en formato de texto de Prometheus (GET /metrics)
+#
+# Contadores, medidores e histogramas simples, sin dependencias: cada métrica
+# guarda sus valores por combinación de etiquetas y exponer() arma el texto.
+# Lo que se mide por análisis se registra una vez, cuando el trabajo termina,
+# a partir del "rendimiento" que devuelve el motor (ver pipeline.py): no hay
+# nada por frame, así que se puede dejar siempre activo.
+#
+# Los valores viven en el proceso de la API (los workers solo devuelven el
+# rendimiento), así que con varios procesos de uvicorn cada uno expone los suyos.
+import bisect
+import math
+import os
+import threading
+
+from almacenamiento import ruta
+from pistas import ruta_pistas
+
+_registro = []
+
+# Segundos: desde una etapa de pocos frames hasta un video largo
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Latencia por frame de la medición en vivo
+BUCKETS_FRAME = (0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _numero(valor) -> str:
+    if valor == math.inf:
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def _clave(self, etiquetas: dict) -> tuple:
+        return tuple(str(etiquetas.get(nombre, "")) for nombre in self.etiquetas)
+
+    def _texto_etiquetas(self, clave: tuple, extra: str = "") -> str:
+        partes = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(self.etiquetas, clave)]
+        if extra:
+            partes.append(extra)
+        return "{" + ",".join(partes) + "}" if partes else ""
+
+    def _muestras(self):
+        with self._lock:
+            valores = dict(self._valores)
+        for clave, valor in sorted(valores.items()):
+            yield f"{self.nombre}{self._texto_etiquetas(clave)} {_numero(valor)}"
+
+    def texto(self) -> str:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        lineas += list(self._muestras())
+        return "\n".join(lineas)
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+
+class Medidor(_Metrica):
+    """Valor actual. Con `funcion` se calcula al exponer: devuelve un número, o
+    un dict {valor de la etiqueta: número} si el medidor tiene una etiqueta."""
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=(), funcion=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def set(self, valor: float, **etiquetas):
+        with self._lock:
+            self._valores[self._clave(etiquetas)] = valor
+
+    def _muestras(self):
+        if self.funcion is not None:
+            valor = self.funcion()
+            if valor is None:
+                return
+            with self._lock:
+                if isinstance(valor, dict):
+                    self._valores = {(str(k),): v for k, v in valor.items()}
+                else:
+                    self._valores = {(): valor}
+        yield from super()._muestras()
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            conteos, suma = self._valores.get(clave, ([0] * len(self.buckets), 0.0))
+            conteos[indice] += 1
+            self._valores[clave] = (conteos, suma + valor)
+
+    def _muestras(self):
+        with self._lock:
+            valores = {clave: (list(conteos), suma) for clave, (conteos, suma) in self._valores.items()}
+        for clave, (conteos, suma) in sorted(valores.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                etiquetas = self._texto_etiquetas(clave, f'le="{_numero(limite)}"')
+                yield f"{self.nombre}_bucket{etiquetas} {acumulado}"
+            yield f"{self.nombre}_sum{self._texto_etiquetas(clave)} {_numero(suma)}"
+            yield f"{self.nombre}_count{self._texto_etiquetas(clave)} {acumulado}"
+
+
+def exponer() -> str:
+    return "\n".join(metrica.texto() for metrica in _registro) + "\n"
+
+
+ETAPAS = Histograma("analisis_etapa_segundos",
+                    "Segundos ocupados por cada etapa del análisis (espera = tiempo en la cola)",
+                    ["etapa", "movimiento"])
+FRAMES = Contador("analisis_frames_total",
+                  "Frames procesados por etapa; con analisis_etapa_segundos_sum da los fps",
+                  ["etapa", "movimiento"])
+TRABAJOS = Contador("analisis_trabajos_total", "Análisis terminados por resultado",
+                    ["movimiento", "estado"])
+CACHE = Contador("analisis_cache_total", "Subidas que se respondieron desde la caché o un trabajo en curso",
+                 ["resultado"])
+BYTES_SUBIDOS = Contador("subidas_bytes_total", "Bytes de video recibidos en las subidas")
+BYTES_ESCRITOS = Contador("videos_escritos_bytes_total", "Bytes escritos en videos/ por tipo de archivo",
+                          ["tipo"])
+FFMPEG = Histograma("ffmpeg_segundos", "Duración de los procesos de ffmpeg fuera del pipeline",
+                    ["operacion"])
+FRAMES_EN_VIVO = Histograma("en_vivo_frame_segundos", "Latencia de cada frame de la medición en vivo",
+                            buckets=BUCKETS_FRAME)
+
+
+def _tamano(path) -> int:
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def _archivos(resultado: dict):
+    # (tipo, ruta) de lo que dejó el análisis en videos/
+    yield "video", resultado.get("output")
+    for nombre, rendicion in resultado.get("rendiciones", {}).items():
+        if nombre != "original":
+            yield "video", ruta(rendicion["archivo"])
+    if resultado.get("pistas"):
+        yield "pistas", ruta_pistas(resultado["pistas"])
+    imagenes = resultado.get("imagenes") or {}
+    for imagen in imagenes.values():
+        url = imagen if isinstance(imagen, str) else imagen["url"]
+        yield "imagenes", ruta(os.path.basename(url))
+
+
+def registrar_analisis(movimiento: str, resultado: dict):
+    """Registra el rendimiento de un análisis terminado y lo que escribió en videos/."""
+    for etapa, valores in resultado.get("rendimiento", {}).items():
+        if not isinstance(valores, dict) or "segundos" not in valores:
+            continue
+        ETAPAS.observar(valores["segundos"], etapa=etapa, movimiento=movimiento)
+        if "frames" in valores:
+            FRAMES.inc(valores["frames"], etapa=etapa, movimiento=movimiento)
+    for tipo, path in _archivos(resultado):
+        BYTES_ESCRITOS.inc(_tamano(path), tipo=tipo)
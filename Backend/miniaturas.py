@@ -0,0 +1,127 @@
+# Imágenes livianas de un análisis, para listar sesiones sin cargar los videos
+#
+# Durante el mismo recorrido que genera el video anotado (ver motor.py) se
+# guardan, ya con el dibujo encima:
+#   - poster: el primer frame en que se detectó a la persona (o el primero del video);
+#   - pico:   el frame con el mayor valor de la medición principal;
+#   - sprite: una grilla de miniaturas tomadas cada SEGUNDOS_MINIATURA, para
+#             mostrar una vista previa al recorrer la línea de tiempo.
+# Mientras se recorre el video solo se guardan copias reducidas; los JPEG se
+# escriben al final. Si el video tiene más de MAXIMO_MINIATURAS miniaturas se
+# descarta una de cada dos y se duplica el intervalo, así el sprite no crece
+# con el largo del video.
+import json
+
+import cv2
+import numpy as np
+
+from almacenamiento import ruta
+
+# Lado largo (px) del poster y del pico
+LADO_IMAGEN = 640
+# Ancho (px) de cada miniatura del sprite
+ANCHO_MINIATURA = 160
+COLUMNAS_SPRITE = 10
+MAXIMO_MINIATURAS = 100
+SEGUNDOS_MINIATURA = 1.0
+CALIDAD_JPEG = 80
+
+
+def url_archivo(analisis_id: str, nombre: str) -> str:
+    # Misma forma que "output": relativa a la raíz de la API (ver /video en main.py)
+    return f"video/{analisis_id}/{nombre}"
+
+
+def _escalar(size, ancho_o_lado: int, por_ancho: bool = False):
+    ancho, alto = size
+    escala = ancho_o_lado / ancho if por_ancho else min(1.0, ancho_o_lado / max(ancho, alto))
+    return max(1, round(ancho * escala)), max(1, round(alto * escala))
+
+
+class Miniaturas:
+    """Recibe los frames anotados, en orden, y guarda poster, pico y sprite del análisis."""
+
+    def __init__(self, analisis_id: str, fps: float, size):
+        self.analisis_id = analisis_id
+        self.fps = fps
+        self.tamano_imagen = _escalar(size, LADO_IMAGEN)
+        self.tamano_miniatura = _escalar(size, ANCHO_MINIATURA, por_ancho=True)
+        self.indice = 0
+        self.poster = None
+        self.poster_detectado = False
+        self.pico = None
+        self.valor_pico = None
+        self.indice_pico = None
+        self.cada = max(1, round(fps * SEGUNDOS_MINIATURA))
+        self.miniaturas = []
+
+    def _reducir(self, frame, tamano):
+        # cv2.resize siempre devuelve una copia: el frame original se sigue usando
+        return cv2.resize(frame, tamano, interpolation=cv2.INTER_AREA)
+
+    def agregar(self, frame: np.ndarray, valor=None):
+        """`valor` es la medición principal del frame, o None si no hubo detección."""
+        indice = self.indice
+        self.indice += 1
+
+        if not self.poster_detectado and (self.poster is None or valor is not None):
+            self.poster = self._reducir(frame, self.tamano_imagen)
+            self.poster_detectado = valor is not None
+
+        if valor is not None and (self.valor_pico is None or valor > self.valor_pico):
+            self.valor_pico = valor
+            self.indice_pico = indice
+            self.pico = self._reducir(frame, self.tamano_imagen)
+
+        if indice % self.cada == 0:
+            self.miniaturas.append(self._reducir(frame, self.tamano_miniatura))
+            if len(self.miniaturas) > MAXIMO_MINIATURAS:
+                # Las que quedan son las de los múltiplos del nuevo intervalo
+                self.miniaturas = self.miniaturas[::2]
+                self.cada *= 2
+
+    def _guardar(self, nombre: str, imagen: np.ndarray) -> str:
+        cv2.imwrite(ruta(f"{self.analisis_id}_{nombre}"), imagen, [cv2.IMWRITE_JPEG_QUALITY, CALIDAD_JPEG])
+        return url_archivo(self.analisis_id, f"{self.analisis_id}_{nombre}")
+
+    def guardar(self) -> dict:
+        """Escribe los JPEG y devuelve sus URLs (también en <id>_imagenes.json)."""
+        if self.poster is None:
+            return {}
+        imagenes = {"poster": self._guardar("poster.jpg", self.poster)}
+        if self.pico is not None:
+            imagenes["pico"] = {
+                "url": self._guardar("pico.jpg", self.pico),
+                "frame": self.indice_pico,
+                "segundo": round(self.indice_pico / self.fps, 2),
+                "valor": round(float(self.valor_pico), 2),
+            }
+
+        ancho, alto = self.tamano_miniatura
+        columnas = min(COLUMNAS_SPRITE, len(self.miniaturas))
+        filas = -(-len(self.miniaturas) // columnas)
+        sprite = np.zeros((filas * alto, columnas * ancho, 3), dtype=np.uint8)
+        for i, miniatura in enumerate(self.miniaturas):
+            fila, columna = divmod(i, columnas)
+            sprite[fila * alto:(fila + 1) * alto, columna * ancho:(columna + 1) * ancho] = miniatura
+        imagenes["sprite"] = {
+            "url": self._guardar("sprite.jpg", sprite),
+            "columnas": columnas,
+            "ancho": ancho,
+            "alto": alto,
+            "cantidad": len(self.miniaturas),
+            "intervalo": round(self.cada / self.fps, 3),
+        }
+
+        with open(ruta(f"{self.analisis_id}_imagenes.json"), "w", encoding="utf-8") as f:
+            json.dump(imagenes, f)
+        return imagenes
+
+
+def cargar_imagenes(analisis_id: str):
+    """Las imágenes guardadas de un análisis, o None si no tiene (o ya se borraron)."""
+    try:
+        with open(ruta(f"{analisis_id}_imagenes.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
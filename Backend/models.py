@@ -66,3 +66,4 @@ class medicion(Base):
     anguloMin= Column(Float, index=True)
     anguloMax= Column(Float, index=True)
     lado= Column(String(100), index=True)
+    video= Column(String(255), nullable=True)
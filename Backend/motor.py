@@ -0,0 +1,329 @@
+# Motor común para analizar un movimiento
+#
+# Todos los movimientos recorren el video igual: decodificar, inferir con
+# MediaPipe, dibujar y codificar (ver pipeline.py). Lo único que cambia es qué
+# landmarks se usan y cómo se calcula el ángulo, así que cada movimiento es una
+# subclase de Analizador y el recorrido del video vive solo acá.
+#
+# Los landmarks de todos los frames se guardan en las pistas (ver pistas.py) y
+# los ángulos se calculan al final sobre la serie completa (ver angulos.py);
+# durante el recorrido solo se mide un frame cuando hay que dibujarlo (y de
+# paso se guardan el poster, el frame del pico y el sprite, ver miniaturas.py).
+import time
+import uuid
+from contextlib import ExitStack
+
+import cv2
+import numpy as np
+
+from pool_modelos import estimador_pose, estimador_hands, estimador_mano
+from medios import EscritorH264, abrir_video, guardar_rendiciones, imagen_para_inferencia, RESOLUCION_INFERENCIA
+from pipeline import ejecutar_pipeline
+from pistas import GrabadorPistas, CAPACIDAD_INICIAL
+from recorte import SeguidorROI, VISIBILIDAD_MINIMA, MARGEN_ROI
+from actividad import DetectorActividad
+from miniaturas import Miniaturas
+from angulos import rango
+from muestreo import landmarks_a_array, PASO_POR_DEFECTO
+
+LADOS = ["izquierda", "derecha"]
+
+# Estimador de MediaPipe según el tipo de landmarks que usa el analizador
+ESTIMADORES = {
+    "pose": estimador_pose,
+    "hands": estimador_hands,
+    "mano": estimador_mano,
+}
+
+
+class Analizador:
+    """Describe un movimiento: qué landmarks mira, cómo mide y cómo dibuja.
+
+    - `tipo` y `forma`: modelo de MediaPipe y forma del array de landmarks por frame
+      (es también lo que se guarda en las pistas).
+    - `serie(landmarks, lado, size)`: ángulo de cada frame de una serie
+      (frames, ...) de landmarks, NaN donde no hay detección.
+    - `medir(landmarks, lado, size)`: medida de un frame, o None si no sirve.
+    - `dibujar(frame, landmarks, medida, lado, texto)`: anota el frame con la medida;
+      con `texto=False` solo dibuja los puntos (el motor escribe el texto).
+    - `texto(medida, lado)`: línea para la lista de mediciones cuando hay varias.
+    - `resultado(landmarks, lado, size)`: ángulos finales de la serie completa.
+    - `puntos_roi(landmarks, lado)`: puntos (N, 2) que tiene que cubrir el
+      recorte del frame siguiente (ver recorte.py).
+    - `tipo_recorte` y `extraer_recorte(results, lado)`: modelo que corre sobre
+      el recorte cuando no es el mismo del frame completo, y cómo leer su salida.
+    - `tipo_ubicacion` y `ubicar(results, lado)`: modelo que ubica la región a
+      recortar cuando no hay seguimiento, y los puntos (N, 2) que la definen.
+    """
+
+    nombre = ""
+    etiqueta = ""  # nombre sin tildes para cv2.putText
+    tipo = "pose"
+    forma = (33, 4)
+    mensaje = "Video procesado y guardado correctamente."
+    tipo_recorte = None
+    tipo_ubicacion = None
+    margen_roi = MARGEN_ROI
+
+    def extraer(self, results):
+        if not results.pose_landmarks:
+            return None
+        return landmarks_a_array(results.pose_landmarks)
+
+    def extraer_recorte(self, results, lado: str):
+        return self.extraer(results)
+
+    def ubicar(self, results, lado: str):
+        return None
+
+    def serie(self, landmarks, lado: str, size) -> np.ndarray:
+        raise NotImplementedError
+
+    def medir(self, landmarks, lado: str, size):
+        angulo = float(self.serie(landmarks[np.newaxis], lado, size)[0])
+        return None if np.isnan(angulo) else angulo
+
+    def senal(self, landmarks, lado: str, size):
+        # Valor que sigue el muestreo adaptativo (ver muestreo.py)
+        return self.medir(landmarks, lado, size)
+
+    def dibujar(self, frame, landmarks, medida, lado: str, texto: bool = True):
+        pass
+
+    def texto(self, medida, lado: str) -> str:
+        return f"{self.etiqueta} {lado.capitalize()}: {int(medida)}"
+
+    def resultado(self, landmarks, lado: str, size) -> dict:
+        return rango(self.serie(landmarks, lado, size))
+
+    def puntos_roi(self, landmarks, lado: str):
+        # Toda la persona visible: Pose necesita el torso para seguir detectando
+        return landmarks[landmarks[:, 3] >= VISIBILIDAD_MINIMA, :2]
+
+
+def validar_lado(lado: str) -> str:
+    lado = lado.lower()
+    if lado not in LADOS:
+        raise ValueError("Lado inválido. Debe ser 'derecha' o 'izquierda'.")
+    return lado
+
+
+def _recorrer_video(mediciones, path: str, paso: int, adaptativo: bool, resolucion: int,
+                    solo_angulos: bool, recorte: bool, solo_movimiento: bool):
+    """Una sola pasada de inferencia para todas las mediciones [(analizador, lado), ...].
+
+    Todas tienen que usar el mismo modelo de MediaPipe. Con `recorte` la
+    inferencia corre sobre la región donde estaba la persona en el frame
+    anterior (ver recorte.py) y con `solo_movimiento` se omiten los tramos
+    sin movimiento (ver actividad.py). Devuelve los landmarks de todos los frames, el
+    tamaño del video, el video anotado (o None), el id de las pistas, el
+    rendimiento, y las imágenes y las rendiciones del video del análisis (o None).
+    """
+    tipos = {analizador.tipo for analizador, _ in mediciones}
+    if len(tipos) != 1:
+        raise ValueError("Todas las mediciones de una pasada deben usar el mismo modelo")
+    tipo = tipos.pop()
+    analizador_principal, lado_principal = mediciones[0]
+    forma = analizador_principal.forma
+    varias = len(mediciones) > 1
+
+    cap, fps, size = abrir_video(path)
+    analisis_id = str(uuid.uuid4())
+    if solo_angulos:
+        # Modo rápido: solo decodificación e inferencia, sin video anotado
+        output_filename = None
+        out = None
+        miniaturas = None
+    else:
+        out = EscritorH264(analisis_id, fps, size)
+        output_filename = out.path
+        miniaturas = Miniaturas(analisis_id, fps, size)
+
+    # Reservar las pistas para todo el video (si el contenedor informa los frames)
+    pistas = GrabadorPistas(tipo, forma, max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))) or CAPACIDAD_INICIAL)
+    # Un recorte que sigue a una sola mano no sirve para medir los dos lados
+    lados = {lado for _, lado in mediciones}
+    if recorte and (analizador_principal.tipo_recorte is None or len(lados) == 1):
+        roi = SeguidorROI(size, analizador_principal.margen_roi)
+    else:
+        roi = None
+    actividad = DetectorActividad(fps) if solo_movimiento else None
+
+    try:
+        with ExitStack() as estimadores:
+            modelo = estimadores.enter_context(ESTIMADORES[tipo]())
+            modelo_recorte = modelo
+            if roi is not None and analizador_principal.tipo_recorte:
+                modelo_recorte = estimadores.enter_context(ESTIMADORES[analizador_principal.tipo_recorte]())
+            preparacion = [0.0]  # segundos reduciendo y pasando a RGB, dentro de la inferencia
+
+            def preparar(imagen):
+                inicio = time.perf_counter()
+                image_rgb = imagen_para_inferencia(imagen, resolucion)
+                preparacion[0] += time.perf_counter() - inicio
+                return image_rgb
+
+            ubicar = None
+            if roi is not None and analizador_principal.tipo_ubicacion:
+                modelo_ubicacion = estimadores.enter_context(ESTIMADORES[analizador_principal.tipo_ubicacion]())
+
+                def ubicar(frame):
+                    image_rgb = preparar(frame)
+                    return analizador_principal.ubicar(modelo_ubicacion.process(image_rgb), lado_principal)
+
+            def detectar(frame):
+                image_rgb = preparar(frame)
+                return analizador_principal.extraer(modelo.process(image_rgb))
+
+            def detectar_recorte(imagen):
+                image_rgb = preparar(imagen)
+                return analizador_principal.extraer_recorte(modelo_recorte.process(image_rgb), lado_principal)
+
+            def inferir(frame):
+                if roi is None:
+                    return detectar(frame)
+                return roi.inferir(frame, detectar,
+                                   lambda landmarks: analizador_principal.puntos_roi(landmarks, lado_principal),
+                                   detectar_recorte, ubicar)
+
+            def senal(landmarks):
+                valores = [analizador.senal(landmarks, lado, size) for analizador, lado in mediciones]
+                if any(valor is None for valor in valores):
+                    return None
+                return valores if varias else valores[0]
+
+            def anotar(frame, landmarks):
+                # Sin video anotado no hay nada que hacer por frame: se mide al final
+                if frame is None:
+                    return
+                if landmarks is None:
+                    miniaturas.agregar(frame)
+                    return
+                fila = 0
+                for analizador, lado in mediciones:
+                    medida = analizador.medir(landmarks, lado, size)
+                    if medida is None:
+                        continue
+                    # Con varias mediciones cada una dibuja sus puntos y el texto va en una lista
+                    analizador.dibujar(frame, landmarks, medida, lado, texto=not varias)
+                    if varias:
+                        cv2.putText(frame, analizador.texto(medida, lado), (20, 40 + 40 * fila),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+                        fila += 1
+                # El pico que se guarda es el de la medición principal
+                miniaturas.agregar(frame, analizador_principal.senal(landmarks, lado_principal, size))
+
+            rendimiento = ejecutar_pipeline(cap, inferir, senal, anotar, out,
+                                            paso=paso, adaptativo=adaptativo, pistas=pistas,
+                                            actividad=actividad)
+            rendimiento["inferencia"]["preparacion_segundos"] = round(preparacion[0], 3)
+            if roi is not None:
+                rendimiento["recorte"] = roi.resumen()
+            if actividad is not None:
+                rendimiento["actividad"] = actividad.resumen()
+    finally:
+        try:
+            cap.release()
+        finally:
+            # Aunque falle el lector (subida interrumpida) no queda un ffmpeg codificando
+            inicio_cierre = time.perf_counter()
+            if out is not None:
+                out.release()
+    fin_video = time.perf_counter()
+    pistas.guardar(analisis_id, fps, size)
+    imagenes = miniaturas.guardar() if miniaturas is not None else None
+    rendiciones = out.rendiciones() if out is not None else None
+    if rendiciones:
+        guardar_rendiciones(analisis_id, rendiciones)
+    # Lo que queda después del último frame: ffmpeg termina los MP4 (y mueve el
+    # moov al inicio), y se escriben las pistas y las imágenes
+    rendimiento["cierre"] = {
+        "video": round(fin_video - inicio_cierre, 3),
+        "segundos": round(time.perf_counter() - inicio_cierre, 3),
+    }
+
+    if output_filename:
+        print(f"Video procesado guardado en: {output_filename}")
+    return pistas.landmarks, size, output_filename, analisis_id, rendimiento, imagenes, rendiciones
+
+
+def procesar_video(analizador: Analizador, path: str, lado: str, paso: int = PASO_POR_DEFECTO,
+                   adaptativo: bool = False, resolucion: int = RESOLUCION_INFERENCIA,
+                   solo_angulos: bool = False, recorte: bool = False,
+                   solo_movimiento: bool = False) -> dict:
+    """Recorre el video una vez con el analizador y devuelve sus mediciones."""
+    lado = validar_lado(lado)
+    landmarks, size, output_filename, analisis_id, rendimiento, imagenes, rendiciones = _recorrer_video(
+        [(analizador, lado)], path, paso, adaptativo, resolucion, solo_angulos, recorte, solo_movimiento)
+
+    medicion = analizador.resultado(landmarks, lado, size)
+    print(f"{analizador.nombre} {lado}: {medicion}")
+
+    resultado = {
+        "message": analizador.mensaje.format(lado=lado),
+        "output": output_filename,
+        "lado": lado,
+    }
+    resultado.update(medicion)
+    resultado["pistas"] = analisis_id
+    if imagenes:
+        resultado["imagenes"] = imagenes
+    if rendiciones:
+        resultado["rendiciones"] = rendiciones
+    resultado["rendimiento"] = rendimiento
+    return resultado
+
+
+def procesar_evaluacion(mediciones, path: str, paso: int = PASO_POR_DEFECTO, adaptativo: bool = False,
+                        resolucion: int = RESOLUCION_INFERENCIA, solo_angulos: bool = False,
+                        recorte: bool = False, solo_movimiento: bool = False) -> dict:
+    """Varios movimientos y lados con una sola inferencia por frame.
+
+    `mediciones` es una lista de (analizador, lado). El resultado trae los
+    ángulos agrupados por movimiento y lado: {"flexión": {"derecha": {...}}}.
+    """
+    mediciones = [(analizador, validar_lado(lado)) for analizador, lado in mediciones]
+    landmarks, size, output_filename, analisis_id, rendimiento, imagenes, rendiciones = _recorrer_video(
+        mediciones, path, paso, adaptativo, resolucion, solo_angulos, recorte, solo_movimiento)
+
+    resultado = {
+        "message": "Evaluación procesada correctamente.",
+        "output": output_filename,
+        "mediciones": _agrupar(mediciones, landmarks, size),
+        "pistas": analisis_id,
+        "rendimiento": rendimiento,
+    }
+    if imagenes:
+        resultado["imagenes"] = imagenes
+    if rendiciones:
+        resultado["rendiciones"] = rendiciones
+    return resultado
+
+
+def _agrupar(mediciones, landmarks, size) -> dict:
+    agrupadas = {}
+    for analizador, lado in mediciones:
+        agrupadas.setdefault(analizador.nombre, {})[lado] = analizador.resultado(landmarks, lado, size)
+    return agrupadas
+
+
+def procesar_pistas(analizador: Analizador, landmarks: np.ndarray, lado: str, size) -> dict:
+    """Mismas mediciones que procesar_video, pero desde pistas guardadas (sin video ni inferencia)."""
+    lado = validar_lado(lado)
+    resultado = {
+        "message": "Medición recalculada correctamente.",
+        "output": None,
+        "lado": lado,
+    }
+    resultado.update(analizador.resultado(landmarks, lado, size))
+    return resultado
+
+
+def procesar_evaluacion_pistas(mediciones, landmarks: np.ndarray, size) -> dict:
+    """Como procesar_evaluacion, desde pistas guardadas."""
+    mediciones = [(analizador, validar_lado(lado)) for analizador, lado in mediciones]
+    return {
+        "message": "Evaluación recalculada correctamente.",
+        "output": None,
+        "mediciones": _agrupar(mediciones, landmarks, size),
+    }
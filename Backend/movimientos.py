@@ -0,0 +1,20 @@
+# Registro de movimientos que se pueden analizar
+#
+# La clave es el nombre del movimiento tal como está en la tabla `movimiento`
+# (en minúsculas). Para agregar un movimiento basta con escribir su Analizador
+# (ver motor.py) y sumarlo a ANALIZADORES; el recorrido del video es el mismo.
+from abduccion_video import Abduccion
+from pys_video import PronacionSupinacion
+from flexion_video import Flexion
+
+ANALIZADORES = {
+    analizador.nombre: analizador
+    for analizador in (Abduccion(), PronacionSupinacion(), Flexion())
+}
+
+
+def obtener_analizador(movimiento: str):
+    analizador = ANALIZADORES.get(movimiento.strip().lower())
+    if analizador is None:
+        raise ValueError("Movimiento no reconocido")
+    return analizador
@@ -0,0 +1,122 @@
+# Muestreo de frames para la inferencia: cada N frames o adaptativo
+#
+# Los frames sin inferencia reciben landmarks interpolados linealmente entre los
+# dos frames inferidos que los rodean, así el video anotado se sigue dibujando
+# en todos los frames.
+#
+# Sin garantía de error: saltear frames no solo cambia qué frames se
+# interpolan, también cambia el seguimiento temporal de MediaPipe (el modelo usa
+# el frame anterior para ubicar a la persona), así que los frames inferidos dan
+# otros landmarks y el min/max puede quedar corto o pasarse. En el clip de
+# referencia (benchmark.py --paso N [--adaptativo] sobre
+# benchmarks/corpus/flexion_referencia.mp4, flexión derecha, resolución original):
+#
+#   paso              max      min      p5
+#   1               178.7°   40.8°    56.8
+#   2               175.4°   48.0°    59.1
+#   3               176.6°   22.1°    31.9   (el mínimo se pasa 18.7°)
+#   3 adaptativo    176.3°   41.9°    73.4
+#   5               178.7°   56.0°   107.3
+#   5 adaptativo    178.5°   44.3°    57.8
+#
+# El modo adaptativo vuelve a inferir todos los frames cuando el ángulo se
+# movió más de TOLERANCIA_GRADOS en el último paso; es lo que más se acerca,
+# pero tampoco asegura un error acotado. Antes de usar un paso > 1 para
+# mediciones clínicas hay que comparar con benchmark.py en clips propios.
+import itertools
+
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+# Valores por defecto: inferencia en todos los frames (mismo resultado de siempre)
+PASO_POR_DEFECTO = 1
+PASO_MAXIMO = 8
+TOLERANCIA_GRADOS = 3.0
+
+
+def landmarks_a_array(landmark_list) -> np.ndarray:
+    """Copia un NormalizedLandmarkList de MediaPipe a un array (landmarks, 4): x, y, z, visibility.
+
+    Los landmarks de Hands no traen visibility; se guardan como visibles (1.0)
+    para que mp_drawing los siga dibujando.
+    """
+    puntos = landmark_list.landmark
+    # O todos los landmarks de la lista traen visibility (Pose) o ninguno (Hands)
+    con_visibilidad = len(puntos) > 0 and puntos[0].HasField("visibility")
+    valores = itertools.chain.from_iterable(
+        (l.x, l.y, l.z, l.visibility if con_visibilidad else 1.0) for l in puntos)
+    return np.fromiter(valores, dtype=np.float32, count=4 * len(puntos)).reshape(-1, 4)
+
+
+def array_a_landmarks(puntos: np.ndarray):
+    """Operación inversa, para poder seguir dibujando con mp_drawing."""
+    lista = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in puntos:
+        lista.landmark.add(x=float(x), y=float(y), z=float(z), visibility=float(visibility))
+    return lista
+
+
+def _interpolar(pendientes, inicio, fin):
+    n = len(pendientes)
+    for i, frame in enumerate(pendientes, start=1):
+        if inicio is None or fin is None:
+            yield frame, None, False
+        else:
+            t = i / (n + 1)
+            yield frame, inicio + (fin - inicio) * t, False
+
+
+def recorrer_frames(cap, inferir, senal=None, paso: int = PASO_POR_DEFECTO, adaptativo: bool = False):
+    """Recorre el video y genera (frame, puntos, inferido) para cada frame, en orden.
+
+    `inferir(frame)` devuelve el array de landmarks del frame o None si no hay
+    detección. Solo se llama cada `paso` frames; el resto se interpola.
+    Con `adaptativo`, `senal(puntos)` da el ángulo que se vigila para decidir
+    si el siguiente tramo se infiere completo o salteado (o una lista de
+    ángulos: manda el que más se movió).
+    """
+    paso = max(1, min(int(paso), PASO_MAXIMO))
+    salto = 1 if adaptativo else paso
+
+    pendientes = []
+    anterior = None          # landmarks del último frame inferido
+    valor_anterior = None    # señal del último frame inferido
+    faltan = 0
+
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        if faltan > 0:
+            pendientes.append(frame)
+            faltan -= 1
+            continue
+
+        puntos = inferir(frame)
+        gap = len(pendientes) + 1
+        yield from _interpolar(pendientes, anterior, puntos)
+        pendientes = []
+        yield frame, puntos, True
+
+        if adaptativo:
+            valor = senal(puntos) if puntos is not None else None
+            if valor is None or valor_anterior is None:
+                salto = 1
+            else:
+                # Si en el próximo paso completo el ángulo se movería más que la
+                # tolerancia, se infiere cada frame hasta que el movimiento se calme
+                velocidad = np.max(np.abs(np.subtract(valor, valor_anterior))) / gap
+                salto = 1 if velocidad * paso > TOLERANCIA_GRADOS else paso
+            valor_anterior = valor
+
+        anterior = puntos
+        faltan = salto - 1
+
+    # Los últimos frames del video no tienen un frame inferido después:
+    # se infiere el último para cerrar la interpolación
+    if pendientes:
+        ultimo = pendientes.pop()
+        puntos = inferir(ultimo)
+        yield from _interpolar(pendientes, anterior, puntos)
+        yield ultimo, puntos, True
@@ -0,0 +1,216 @@
+# Pipeline por etapas para procesar un video
+#
+#   [hilo decodificación] -> cola -> [inferencia] -> cola -> [hilo anotación + codificación]
+#
+# Las colas son acotadas: como mucho hay PROFUNDIDAD_COLA frames esperando entre
+# etapas (más los que retiene el muestreo para interpolar), así que la memoria
+# no crece con el largo del video. OpenCV, MediaPipe y la escritura al pipe de
+# ffmpeg liberan el GIL, por lo que las etapas se solapan en equipos multinúcleo.
+#
+# Con un DetectorActividad (ver actividad.py) el hilo de decodificación marca
+# cada frame como activo o no, y los frames sin movimiento cerca no se infieren.
+import queue
+import threading
+import time
+
+from muestreo import recorrer_frames, PASO_POR_DEFECTO
+
+PROFUNDIDAD_COLA = 4
+
+_FIN = object()
+
+
+class _Etapa:
+    """Cuenta frames y tiempo ocupado de una etapa."""
+
+    def __init__(self):
+        self.frames = 0
+        self.segundos = 0.0
+
+    def resumen(self) -> dict:
+        return {
+            "frames": self.frames,
+            "segundos": round(self.segundos, 3),
+            "fps": round(self.frames / self.segundos, 1) if self.segundos else None,
+        }
+
+
+def _poner(cola, item, detener):
+    # put con timeout para no quedar bloqueado si otra etapa falló
+    while not detener.is_set():
+        try:
+            cola.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _sacar(cola, detener):
+    while not detener.is_set():
+        try:
+            return cola.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _FIN
+
+
+class _LectorCola:
+    """Expone la cola de frames decodificados con la interfaz de cv2.VideoCapture.
+
+    `activo` indica si el último frame leído hay que inferirlo.
+    """
+
+    def __init__(self, cola, detener):
+        self.cola = cola
+        self.detener = detener
+        self.abierto = True
+        self.activo = True
+
+    def isOpened(self):
+        return self.abierto
+
+    def read(self):
+        item = _sacar(self.cola, self.detener)
+        if item is _FIN:
+            self.abierto = False
+            return False, None
+        frame, self.activo = item
+        return True, frame
+
+
+def ejecutar_pipeline(cap, inferir, senal, anotar, out,
+                      paso: int = PASO_POR_DEFECTO, adaptativo: bool = False, pistas=None,
+                      actividad=None) -> dict:
+    """Procesa el video completo y devuelve el rendimiento por etapa.
+
+    - `inferir(frame)` corre en el hilo que llama (MediaPipe) y devuelve landmarks o None.
+    - `anotar(frame, landmarks)` dibuja sobre el frame y acumula las mediciones;
+      se llama en orden, un frame a la vez, desde el hilo de codificación.
+    - `out` recibe cada frame anotado con out.write(frame). Con out=None (solo
+      ángulos) los frames no pasan a la última etapa: `anotar` recibe frame=None
+      y solo acumula las mediciones.
+    - `pistas` (GrabadorPistas, opcional) guarda los landmarks de cada frame.
+    - `actividad` (DetectorActividad, opcional) omite la inferencia en los
+      tramos sin movimiento; esos frames quedan sin landmarks.
+    """
+    decodificadas = queue.Queue(maxsize=PROFUNDIDAD_COLA)
+    inferidas = queue.Queue(maxsize=PROFUNDIDAD_COLA)
+    detener = threading.Event()
+    errores = []
+
+    nombres = ["decodificacion", "inferencia", "anotacion", "codificacion"]
+    if actividad is not None:
+        nombres.insert(1, "actividad")
+    etapas = {nombre: _Etapa() for nombre in nombres}
+
+    def separar_actividad(frame):
+        # frame=None: fin del video
+        if actividad is None:
+            return [(frame, True)] if frame is not None else []
+        inicio = time.perf_counter()
+        if frame is None:
+            listos = actividad.terminar()
+        else:
+            listos = actividad.agregar(frame)
+            etapas["actividad"].frames += 1
+        etapas["actividad"].segundos += time.perf_counter() - inicio
+        return listos
+
+    def decodificar():
+        try:
+            while cap.isOpened():
+                inicio = time.perf_counter()
+                ret, frame = cap.read()
+                etapas["decodificacion"].segundos += time.perf_counter() - inicio
+                if not ret:
+                    break
+                etapas["decodificacion"].frames += 1
+                for item in separar_actividad(frame):
+                    if not _poner(decodificadas, item, detener):
+                        return
+            # Los frames que el detector retenía para mirar hacia adelante
+            for item in separar_actividad(None):
+                if not _poner(decodificadas, item, detener):
+                    return
+        except Exception as e:
+            errores.append(e)
+            detener.set()
+        finally:
+            _poner(decodificadas, _FIN, detener)
+
+    def anotar_y_codificar():
+        try:
+            while True:
+                item = _sacar(inferidas, detener)
+                if item is _FIN:
+                    return
+                frame, landmarks, inferido = item
+                if pistas is not None:
+                    pistas.agregar(landmarks, inferido)
+
+                inicio = time.perf_counter()
+                anotar(frame, landmarks)
+                etapas["anotacion"].segundos += time.perf_counter() - inicio
+                etapas["anotacion"].frames += 1
+
+                if out is None:
+                    continue
+                inicio = time.perf_counter()
+                out.write(frame)
+                etapas["codificacion"].segundos += time.perf_counter() - inicio
+                etapas["codificacion"].frames += 1
+        except Exception as e:
+            errores.append(e)
+            detener.set()
+
+    def inferir_medido(frame):
+        # El muestreo siempre infiere el último frame que leyó
+        if not lector.activo:
+            return None
+        inicio = time.perf_counter()
+        landmarks = inferir(frame)
+        etapas["inferencia"].segundos += time.perf_counter() - inicio
+        etapas["inferencia"].frames += 1
+        return landmarks
+
+    hilo_decodificacion = threading.Thread(target=decodificar, daemon=True)
+    hilo_codificacion = threading.Thread(target=anotar_y_codificar, daemon=True)
+
+    inicio_total = time.perf_counter()
+    hilo_decodificacion.start()
+    hilo_codificacion.start()
+    try:
+        lector = _LectorCola(decodificadas, detener)
+        for frame, landmarks, inferido in recorrer_frames(lector, inferir_medido, senal, paso=paso, adaptativo=adaptativo):
+            # Un frame sin movimiento que tocaba inferir no pasó por MediaPipe
+            inferido = inferido and lector.activo
+            if out is None:
+                frame = None  # el frame ya no se usa: se libera apenas termina la inferencia
+            if not _poner(inferidas, (frame, landmarks, inferido), detener):
+                break
+    except Exception:
+        detener.set()
+        raise
+    finally:
+        _poner(inferidas, _FIN, detener)
+        hilo_codificacion.join()
+        # Si la inferencia terminó antes, hay que destrabar al hilo de decodificación
+        detener.set()
+        hilo_decodificacion.join()
+
+    if errores:
+        raise errores[0]
+
+    total = time.perf_counter() - inicio_total
+    rendimiento = {nombre: etapa.resumen() for nombre, etapa in etapas.items()}
+    frames = etapas["anotacion"].frames
+    rendimiento["total"] = {
+        "frames": frames,
+        "segundos": round(total, 3),
+        "fps": round(frames / total, 1) if total else None,
+    }
+    # La etapa que más tiempo estuvo ocupada es la que limita al resto
+    rendimiento["cuello_de_botella"] = max(etapas, key=lambda nombre: etapas[nombre].segundos)
+    print(f"Rendimiento del pipeline: {rendimiento}")
+    return rendimiento
@@ -0,0 +1,91 @@
+# Pistas de landmarks por frame guardadas junto al video
+#
+# Cada análisis deja un <id>_pistas.npz (ver almacenamiento.py) con:
+#   landmarks  float32 (frames, landmarks, 4): x, y, z, visibility normalizados (NaN = sin detección)
+#   inferido   bool    (frames,): True si el frame pasó por MediaPipe, False si se interpoló
+#   tipo       "pose" o "hands"
+#   fps, size  datos del video original
+# Con esto se pueden recalcular los ángulos para otro lado o movimiento sin
+# decodificar el video ni volver a correr la inferencia.
+import os
+import uuid
+
+import numpy as np
+
+from almacenamiento import ruta
+
+
+def ruta_pistas(analisis_id: str) -> str:
+    return ruta(f"{analisis_id}_pistas.npz")
+
+
+# Capacidad inicial cuando el contenedor no informa la cantidad de frames (WebM)
+CAPACIDAD_INICIAL = 256
+
+
+class GrabadorPistas:
+    """Acumula los landmarks de cada frame en el orden en que salen del pipeline.
+
+    Se escriben en un único array float32 (frames, landmarks, 4) reservado de
+    antemano con `capacidad` frames; si el video trae más, se duplica.
+    """
+
+    def __init__(self, tipo: str, forma: tuple, capacidad: int = CAPACIDAD_INICIAL):
+        self.tipo = tipo
+        self.forma = forma
+        self.frames = 0
+        self._landmarks = np.full((max(1, capacidad),) + forma, np.nan, dtype=np.float32)
+        self._inferidos = np.zeros(max(1, capacidad), dtype=bool)
+
+    def _crecer(self):
+        extra = len(self._inferidos)
+        self._landmarks = np.concatenate(
+            [self._landmarks, np.full((extra,) + self.forma, np.nan, dtype=np.float32)])
+        self._inferidos = np.concatenate([self._inferidos, np.zeros(extra, dtype=bool)])
+
+    def agregar(self, landmarks, inferido: bool):
+        if self.frames == len(self._inferidos):
+            self._crecer()
+        # Los frames sin detección quedan en NaN, que es el valor inicial
+        if landmarks is not None:
+            self._landmarks[self.frames] = landmarks
+        self._inferidos[self.frames] = inferido
+        self.frames += 1
+
+    @property
+    def landmarks(self) -> np.ndarray:
+        return self._landmarks[:self.frames]
+
+    @property
+    def inferidos(self) -> np.ndarray:
+        return self._inferidos[:self.frames]
+
+    def guardar(self, analisis_id: str, fps: float, size: tuple) -> str:
+        path = ruta_pistas(analisis_id)
+        np.savez(
+            path,
+            landmarks=self.landmarks,
+            inferido=self.inferidos,
+            tipo=np.array(self.tipo),
+            fps=np.float32(fps),
+            size=np.array(size, dtype=np.int32),
+        )
+        return path
+
+
+def cargar_pistas(analisis_id: str) -> dict:
+    # El id viene del cliente: solo se aceptan UUID para no abrir rutas arbitrarias
+    uuid.UUID(analisis_id)
+    path = ruta_pistas(analisis_id)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No hay pistas guardadas para {analisis_id}")
+
+    with np.load(path) as datos:
+        return {
+            "tipo": str(datos["tipo"]),
+            "landmarks": datos["landmarks"],
+            "inferido": datos["inferido"],
+            "fps": float(datos["fps"]),
+            "size": tuple(int(v) for v in datos["size"]),
+        }
+
@@ -0,0 +1,112 @@
+# Pool de procesos con estimadores de MediaPipe ya cargados
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import mediapipe as mp
+import numpy as np
+
+mp_pose = mp.solutions.pose
+mp_hands = mp.solutions.hands
+
+# Un worker por núcleo: cada video corre en su propio proceso
+NUM_WORKERS = os.cpu_count() or 1
+
+# Instancias del proceso actual (solo existen dentro de un worker del pool)
+_pose = None
+_hands = None
+_mano = None
+
+
+def crear_pose():
+    return mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5)
+
+
+def crear_hands():
+    return mp_hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+
+def crear_mano():
+    # Una sola mano: para inferir sobre el recorte de la mano que se mide (ver recorte.py)
+    return mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+
+def iniciar_worker():
+    """Inicializador de cada proceso del pool: carga los grafos una sola vez."""
+    global _pose, _hands, _mano
+    _pose = crear_pose()
+    _hands = crear_hands()
+    _mano = crear_mano()
+
+    # Un frame en negro obliga a cargar los modelos antes del primer video real
+    vacio = np.zeros((256, 256, 3), dtype=np.uint8)
+    _pose.process(vacio)
+    _hands.process(vacio)
+    _mano.process(vacio)
+
+
+def _listo():
+    return os.getpid()
+
+
+def ejecutar(encolado: float, funcion, *args, **kwargs):
+    """Corre funcion(*args, **kwargs) en el worker y agrega al rendimiento la espera en la cola."""
+    espera = time.time() - encolado
+    resultado = funcion(*args, **kwargs)
+    if isinstance(resultado, dict) and isinstance(resultado.get("rendimiento"), dict):
+        resultado["rendimiento"]["espera"] = {"segundos": round(espera, 3)}
+    return resultado
+
+
+def crear_executor() -> ProcessPoolExecutor:
+    # spawn: el proceso padre puede tener hilos y no conviene heredar su estado con fork
+    return ProcessPoolExecutor(
+        max_workers=NUM_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=iniciar_worker,
+    )
+
+
+def precalentar(executor: ProcessPoolExecutor):
+    # Lanza una tarea vacía por worker para que todos arranquen (y carguen modelos) al iniciar la API
+    for _ in range(NUM_WORKERS):
+        executor.submit(_listo)
+
+
+@contextmanager
+def estimador_pose():
+    """Entrega un Pose listo para un video nuevo.
+
+    Dentro del pool se reutiliza la instancia del worker y se reinicia su tracker;
+    fuera del pool (scripts, pruebas manuales) se crea una instancia temporal.
+    """
+    if _pose is None:
+        with crear_pose() as pose:
+            yield pose
+        return
+    _pose.reset()
+    yield _pose
+
+
+@contextmanager
+def estimador_hands():
+    """Igual que estimador_pose, pero para mp_hands.Hands."""
+    if _hands is None:
+        with crear_hands() as hands:
+            yield hands
+        return
+    _hands.reset()
+    yield _hands
+
+
+@contextmanager
+def estimador_mano():
+    """Igual que estimador_hands, con la instancia de una sola mano."""
+    if _mano is None:
+        with crear_mano() as mano:
+            yield mano
+        return
+    _mano.reset()
+    yield _mano
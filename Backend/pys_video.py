@@ -1,173 +1,203 @@
 import cv2
 import numpy as np
 import mediapipe as mp
-import uuid
-import os
+from motor import Analizador, LADOS
+from recorte import MARGEN_ROI_MANO, VISIBILIDAD_MINIMA
+from angulos import angulo, rango
+from muestreo import landmarks_a_array, array_a_landmarks
 
 mp_hands = mp.solutions.hands
+mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
 
-OUTPUT_DIR = "videos"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
 # ==========================
 # CONFIGURACIÓN
 # ==========================
 BASE_FINGER = mp_hands.HandLandmark.RING_FINGER_TIP
 TIP_FINGER = mp_hands.HandLandmark.INDEX_FINGER_TIP
 NEUTRAL_X_THRESHOLD = 10  # Margen de neutralidad en píxeles
+DESPLAZAMIENTO_VIRTUAL_PX = 40
 
-# ==========================
-# CÁLCULO DE ÁNGULO
-# ==========================
-def calculate_angle(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-
-    rad = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(rad * 180.0 / np.pi)
-
-    if angle > 180.0:
-        angle = 360 - angle
-
-    return angle
-
+# Estado de la mano en cada frame (índice en ESTADOS) y su color
+NEUTRAL, PRONACION, SUPINACION = 0, 1, 2
+ESTADOS = [
+    ("Neutral", (255, 255, 0)),     # Amarillo
+    ("Pronacion", (0, 255, 0)),     # Verde
+    ("Supinacion", (0, 0, 255)),    # Rojo
+]
 
 # ==========================
 # PUNTO VIRTUAL FIJO VERTICAL
 # ==========================
-def punto_virtual_fijo_arriba(landmarks, width, height, desplazamiento_px=40):
+def punto_virtual_fijo_arriba(landmarks, width, height, desplazamiento_px=DESPLAZAMIENTO_VIRTUAL_PX):
     base = landmarks[BASE_FINGER]
-    base_xy = np.array([base.x * width, base.y * height])
+    base_xy = np.array([base[0] * width, base[1] * height])
     punto_virtual = base_xy + np.array([0, -desplazamiento_px])  # hacia arriba
     return tuple(punto_virtual.astype(int))
 
+# Landmarks de Pose que ubican la mano de cada lado (codo, muñeca y dedos)
+PUNTOS_MANO_POSE = {
+    "izquierda": [mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST,
+                  mp_pose.PoseLandmark.LEFT_PINKY, mp_pose.PoseLandmark.LEFT_INDEX,
+                  mp_pose.PoseLandmark.LEFT_THUMB],
+    "derecha": [mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST,
+                mp_pose.PoseLandmark.RIGHT_PINKY, mp_pose.PoseLandmark.RIGHT_INDEX,
+                mp_pose.PoseLandmark.RIGHT_THUMB],
+}
+
 # ==========================
-# FUNCIÓN PRINCIPAL
+# SELECCIÓN DE MANO
 # ==========================
-def pys_video(path: str, lado: str):
-    if lado.lower() not in ["izquierda", "derecha"]:
-        raise ValueError("El parámetro 'lado' debe ser 'izquierda' o 'derecha'")
-
-    cap = cv2.VideoCapture(path)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    size = (int(cap.get(3)), int(cap.get(4)))
-    output_filename = f"{OUTPUT_DIR}/{uuid.uuid4()}_output.mp4"
-    out = cv2.VideoWriter(output_filename, fourcc, fps, size)
-
-    pronation_angles = []
-    supination_angles = []
-
-    hands = mp_hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(image_rgb)
-
-        # Posiciones fijas para mostrar texto en esquina superior izquierda
-        text_angle_pos = (20, 50)
-        text_state_pos = (20, 90)
-
-        # Variables para mostrar texto de la mano válida (del lado correcto)
-        texto_angulo = None
-        texto_estado = None
-        color_estado = (255, 255, 255)  # default blanco
-
-        if results.multi_hand_landmarks and results.multi_handedness:
-            for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
-                label = handedness.classification[0].label
-                label = "Right" if label == "Left" else "Left" if label == "Right" else label
-
-                if (lado.lower() == "izquierda" and label != "Left") or (lado.lower() == "derecha" and label != "Right"):
-                    continue
-
-                mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-                landmarks = hand_landmarks.landmark
-                height, width, _ = frame.shape
-
-                punto_base = (int(landmarks[BASE_FINGER].x * width),
-                              int(landmarks[BASE_FINGER].y * height))
-                punto_punta = (int(landmarks[TIP_FINGER].x * width),
-                               int(landmarks[TIP_FINGER].y * height))
-                punto_virtual = punto_virtual_fijo_arriba(landmarks, width, height)
-
-                cv2.circle(frame, punto_base, 8, (255, 0, 0), -1)    # Azul - base
-                cv2.circle(frame, punto_punta, 8, (0, 255, 0), -1)   # Verde - punta
-                cv2.circle(frame, punto_virtual, 8, (0, 0, 255), -1) # Rojo - punto virtual
-
-                angle = calculate_angle(punto_virtual, punto_base, punto_punta)
-
-                # Clasificación por posición en eje X
-                indice_x = landmarks[TIP_FINGER].x * width
-                base_x = landmarks[BASE_FINGER].x * width
-                dif_x = indice_x - base_x
-
-                if abs(dif_x) < NEUTRAL_X_THRESHOLD:
-                    estado = "Neutral"
-                    color = (255, 255, 0)  # Amarillo
-                else:
-                    if lado.lower() == "derecha":
-                        if dif_x > 0:
-                            estado = "Pronacion"
-                            color = (0, 255, 0)  # Verde
-                            pronation_angles.append(angle)
-                        else:
-                            estado = "Supinacion"
-                            color = (0, 0, 255)  # Rojo
-                            supination_angles.append(angle)
-                    else:  # izquierda
-                        if dif_x < 0:
-                            estado = "Pronacion"
-                            color = (0, 255, 0)  # Verde
-                            pronation_angles.append(angle)
-                        else:
-                            estado = "Supinacion"
-                            color = (0, 0, 255)  # Rojo
-                            supination_angles.append(angle)
-
-                # Guardar texto para mostrar en la esquina
-                texto_angulo = f'Angulo: {int(angle)}'
-                texto_estado = estado
-                color_estado = color
-
-                # Solo procesar la primera mano válida del lado correcto
-                break
-
-        # Mostrar texto fijo en la esquina (si se detectó alguna mano del lado correcto)
-        if texto_angulo and texto_estado:
-            cv2.putText(frame, texto_angulo, text_angle_pos,
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            cv2.putText(frame, texto_estado, text_state_pos,
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, color_estado, 3)
-
-        out.write(frame)
-
-    cap.release()
-    out.release()
-    hands.close()
-
-    resultado = {
-        "message": "Video procesado y guardado correctamente.",
-        "output": output_filename,
-        "lado": lado.lower()
-    }
-
-    if pronation_angles:
-        resultado["pronacion"] = {
-            "min_angle": min(pronation_angles),
-            "max_angle": max(pronation_angles)
-        }
-
-    if supination_angles:
-        resultado["supinacion"] = {
-            "min_angle": min(supination_angles),
-            "max_angle": max(supination_angles)
-        }
-
-    return resultado
+# Orden de las manos en los arrays de landmarks: (izquierda, derecha), igual que LADOS
+NUM_LANDMARKS_MANO = len(mp_hands.HandLandmark)
+
+
+def manos_por_lado(results):
+    """Array (2, 21, 4) con la primera mano izquierda y derecha (NaN si falta), o None sin manos.
+
+    Se guardan ambas manos para poder re-analizar el otro lado desde las pistas.
+    """
+    if not (results.multi_hand_landmarks and results.multi_handedness):
+        return None
+
+    manos = np.full((len(LADOS), NUM_LANDMARKS_MANO, 4), np.nan, dtype=np.float32)
+    for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
+        label = handedness.classification[0].label
+        label = "Right" if label == "Left" else "Left" if label == "Right" else label
+        if label not in ("Left", "Right"):
+            continue
+
+        i = LADOS.index("izquierda" if label == "Left" else "derecha")
+        # Solo la primera mano válida de cada lado
+        if np.isnan(manos[i, 0, 0]):
+            manos[i] = landmarks_a_array(hand_landmarks)
+    return manos
+
+
+def mano_del_lado(manos, lado: str):
+    """Landmarks (21, 4) de la mano del lado pedido, o None si no se detectó."""
+    if manos is None:
+        return None
+    mano = manos[LADOS.index(lado.lower())]
+    if np.isnan(mano).any():
+        return None
+    return mano
+
+
+def angulo_mano(landmarks, width, height):
+    """Ángulo de un frame y los puntos en píxeles usados para dibujarlo."""
+    punto_base = (int(landmarks[BASE_FINGER][0] * width),
+                  int(landmarks[BASE_FINGER][1] * height))
+    punto_punta = (int(landmarks[TIP_FINGER][0] * width),
+                   int(landmarks[TIP_FINGER][1] * height))
+    punto_virtual = punto_virtual_fijo_arriba(landmarks, width, height)
+    return float(angulo(punto_virtual, punto_base, punto_punta)), punto_base, punto_punta, punto_virtual
+
+
+def serie_mano(manos, lado: str, size):
+    """Ángulo y estado de cada frame de una serie (frames, 2, 21, 4); NaN / NEUTRAL sin mano.
+
+    Es angulo_mano y la clasificación por X para todos los frames a la vez, con
+    los mismos puntos truncados a píxeles enteros.
+    """
+    mano = manos[..., LADOS.index(lado.lower()), :, :]
+    escala = np.array(size, dtype=np.float64)
+    base = mano[..., BASE_FINGER, :2] * escala
+    punta = mano[..., TIP_FINGER, :2] * escala
+    punto_virtual = base + np.array([0, -DESPLAZAMIENTO_VIRTUAL_PX])
+    angulos = angulo(np.trunc(punto_virtual), np.trunc(base), np.trunc(punta))
+
+    # Clasificación por posición en eje X de la punta respecto de la base
+    dif_x = punta[..., 0] - base[..., 0]
+    pronacion = dif_x > 0 if lado.lower() == "derecha" else dif_x < 0
+    estados = np.where(pronacion, PRONACION, SUPINACION)
+    estados[~(np.abs(dif_x) >= NEUTRAL_X_THRESHOLD)] = NEUTRAL  # incluye NaN
+    return angulos, estados
+
+
+class PronacionSupinacion(Analizador):
+    """Pronación/supinación: ángulo del índice respecto de la vertical, clasificado por lado."""
+
+    nombre = "pronación y supinación"
+    etiqueta = "PyS"
+    tipo = "hands"
+    forma = (len(LADOS), NUM_LANDMARKS_MANO, 4)
+    # Con recorte se sigue solo la mano medida, con el modelo de una mano, y
+    # Pose ubica la muñeca cuando hay que buscarla
+    tipo_recorte = "mano"
+    tipo_ubicacion = "pose"
+    margen_roi = MARGEN_ROI_MANO
+
+    # Posiciones fijas para mostrar texto en esquina superior izquierda
+    text_angle_pos = (20, 50)
+    text_state_pos = (20, 90)
+
+    def extraer(self, results):
+        return manos_por_lado(results)
+
+    def extraer_recorte(self, results, lado):
+        # En el recorte puede aparecer la otra mano: solo vale la del lado medido
+        manos = manos_por_lado(results)
+        if mano_del_lado(manos, lado) is None:
+            return None
+        return manos
+
+    def ubicar(self, results, lado):
+        if not results.pose_landmarks:
+            return None
+        puntos = landmarks_a_array(results.pose_landmarks)[PUNTOS_MANO_POSE[lado.lower()]]
+        if puntos[1, 3] < VISIBILIDAD_MINIMA:  # muñeca
+            return None
+        return puntos[:, :2]
+
+    def puntos_roi(self, manos, lado):
+        mano = mano_del_lado(manos, lado)
+        return None if mano is None else mano[:, :2]
+
+    def serie(self, manos, lado, size):
+        return serie_mano(manos, lado, size)[0]
+
+    def medir(self, manos, lado, size):
+        # Se mide con el tamaño del video, que es también el de cada frame
+        angulos, estados = serie_mano(manos[np.newaxis], lado, size)
+        if np.isnan(angulos[0]):
+            return None
+        estado, color = ESTADOS[estados[0]]
+        return float(angulos[0]), estado, color
+
+    def senal(self, manos, lado, size):
+        # Solo el ángulo: el estado y el color no sirven para medir cambios
+        medida = self.medir(manos, lado, size)
+        return None if medida is None else medida[0]
+
+    def dibujar(self, frame, manos, medida, lado, texto=True):
+        angle, estado, color_estado = medida
+        landmarks = mano_del_lado(manos, lado)
+        _, punto_base, punto_punta, punto_virtual = angulo_mano(landmarks, frame.shape[1], frame.shape[0])
+
+        mp_drawing.draw_landmarks(frame, array_a_landmarks(landmarks), mp_hands.HAND_CONNECTIONS)
+        cv2.circle(frame, punto_base, 8, (255, 0, 0), -1)    # Azul - base
+        cv2.circle(frame, punto_punta, 8, (0, 255, 0), -1)   # Verde - punta
+        cv2.circle(frame, punto_virtual, 8, (0, 0, 255), -1) # Rojo - punto virtual
+
+        # Mostrar texto fijo en la esquina
+        if not texto:
+            return
+        cv2.putText(frame, f'Angulo: {int(angle)}', self.text_angle_pos,
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        cv2.putText(frame, estado, self.text_state_pos,
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, color_estado, 3)
+
+    def texto(self, medida, lado):
+        angle, estado, _ = medida
+        return f"{self.etiqueta} {lado.capitalize()}: {int(angle)} {estado}"
+
+    def resultado(self, manos, lado, size):
+        angulos, estados = serie_mano(manos, lado, size)
+
+        resultado = {}
+        if (estados == PRONACION).any():
+            resultado["pronacion"] = rango(angulos[estados == PRONACION])
+        if (estados == SUPINACION).any():
+            resultado["supinacion"] = rango(angulos[estados == SUPINACION])
+        return resultado
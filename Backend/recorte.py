@@ -0,0 +1,159 @@
+# Recorte de la región de interés (ROI) antes de la inferencia
+#
+# Una vez encontrada la persona, MediaPipe no necesita el frame completo: con
+# la caja de los landmarks del frame anterior más un margen alcanza. Se recorta
+# el frame a esa caja (una vista, sin copiar), se infiere sobre el recorte y
+# los landmarks se vuelven a llevar a coordenadas del frame completo para el
+# resto del motor (ángulos, dibujo, pistas).
+#
+# Eso no deja los ángulos iguales: MediaPipe ve la persona más grande y con
+# otro encuadre, y los landmarks que devuelve cambian. En el clip de referencia
+# (benchmarks/corpus/flexion_referencia.mp4, lado derecho, resolución original,
+# medido con benchmark.py --recorte):
+#
+#   movimiento               sin recorte          con recorte
+#                             máx    mín    p5     máx    mín    p5
+#   flexión                  178.7   40.8   56.8   178.7   29.8   90.8
+#   pronación                105.8    9.8   34.4   108.4   10.7   47.3
+#   supinación                95.1   25.5   34.6    97.2   12.5   29.6
+#
+# Los mínimos se mueven hasta 13° y no siempre hacia el mismo lado, así que por
+# ahora el recorte queda como opción para medir velocidad (apagado por
+# defecto): antes de compararlo con mediciones hechas sin recorte hay que
+# validarlo contra más clips.
+#
+# La caja solo se mueve cuando los landmarks se acercan a su borde o quedan
+# muy chicos dentro de ella: mientras la imagen que recibe MediaPipe sea la
+# misma región, su propio tracker entre frames sigue funcionando. Cuando la
+# caja cambia, ese tracker trae la región del frame anterior y puede no
+# encontrar nada; en ese caso se infiere otra vez el mismo recorte (MediaPipe
+# vuelve a detectar) y, si tampoco hay nada, el frame completo.
+#
+# Para pronación/supinación el recorte sigue solo a la mano que se mide, con
+# un modelo de Hands de una sola mano. Para encontrarla (al inicio o cuando se
+# pierde) Pose ubica la muñeca de ese lado en el frame completo, lo que además
+# sirve en tomas abiertas donde la mano es muy chica para detectarla sin
+# recortar. Si Pose tampoco encuentra el brazo se busca en el frame completo
+# con el modelo de dos manos.
+import numpy as np
+
+# Margen que se agrega a cada lado de la caja, como fracción de su tamaño
+MARGEN_ROI = 0.3
+# La mano cambia de forma al girar: necesita más margen que el cuerpo
+MARGEN_ROI_MANO = 0.6
+# La caja no se achica por debajo de esta fracción del frame (manos, brazo pegado al cuerpo)
+LADO_MINIMO_ROI = 0.2
+# Landmarks de Pose con menos visibilidad no cuentan para la caja
+VISIBILIDAD_MINIMA = 0.5
+# Con menos puntos visibles se da el seguimiento por perdido
+PUNTOS_MINIMOS = 4
+
+
+class SeguidorROI:
+    """Caja de recorte que sigue a los landmarks de un frame al siguiente.
+
+    `caja` es (x0, y0, x1, y1) en píxeles, o None para usar el frame completo.
+    """
+
+    def __init__(self, size, margen: float = MARGEN_ROI):
+        self.ancho, self.alto = size
+        self.margen = margen
+        self.caja = None
+        self.recortados = 0
+        self.completos = 0
+        self.reintentos = 0
+        self.ubicaciones = 0
+
+    def inferir(self, frame: np.ndarray, detectar, puntos_roi, detectar_recorte=None, ubicar=None):
+        """Landmarks del frame (normalizados al frame completo) o None.
+
+        `detectar(imagen)` corre MediaPipe sobre la imagen y `puntos_roi(landmarks)`
+        da los puntos que tiene que cubrir la caja del frame siguiente (None si
+        no hay qué seguir). `detectar_recorte` reemplaza a `detectar` sobre el
+        recorte cuando se usa otro modelo, y `ubicar(frame)` da los puntos de
+        una caja inicial cuando no hay seguimiento.
+        """
+        detectar_recorte = detectar_recorte or detectar
+        ubicada = False
+        if self.caja is None and ubicar is not None:
+            self.ubicaciones += 1
+            self.actualizar(ubicar(frame))
+            ubicada = self.caja is not None
+
+        landmarks = None
+        if self.caja is not None:
+            x0, y0, x1, y1 = self.caja
+            recorte = frame[y0:y1, x0:x1]
+            landmarks = detectar_recorte(recorte)
+            if landmarks is None:
+                self.reintentos += 1
+                landmarks = detectar_recorte(recorte)
+            if landmarks is not None:
+                self.recortados += 1
+                landmarks = self.a_frame_completo(landmarks)
+            else:
+                self.caja = None
+                if ubicada:
+                    # Se sabe dónde está el brazo y ahí no hay mano: el frame
+                    # completo (con la mano más chica) no la va a encontrar
+                    return None
+        if landmarks is None:
+            # Se perdió el seguimiento: se busca de nuevo en todo el frame
+            self.completos += 1
+            landmarks = detectar(frame)
+
+        puntos = None if landmarks is None else puntos_roi(landmarks)
+        self.actualizar(puntos)
+        return landmarks
+
+    def a_frame_completo(self, landmarks):
+        """Pasa landmarks normalizados al recorte a normalizados al frame completo."""
+        if landmarks is None or self.caja is None:
+            return landmarks
+        x0, y0, x1, y1 = self.caja
+        ancho, alto = x1 - x0, y1 - y0
+        landmarks[..., 0] = (landmarks[..., 0] * ancho + x0) / self.ancho
+        landmarks[..., 1] = (landmarks[..., 1] * alto + y0) / self.alto
+        # MediaPipe escala z igual que x
+        landmarks[..., 2] *= ancho / self.ancho
+        return landmarks
+
+    def actualizar(self, puntos):
+        """Ajusta la caja a los puntos (N, 2) normalizados al frame completo."""
+        if puntos is None or len(puntos) < PUNTOS_MINIMOS:
+            self.caja = None
+            return
+
+        ancho, alto = self.ancho, self.alto
+        x0, y0 = np.nanmin(puntos, axis=0) * (ancho, alto)
+        x1, y1 = np.nanmax(puntos, axis=0) * (ancho, alto)
+
+        # Si los puntos siguen dentro de la caja actual con la mitad del margen
+        # libre, y la caja no les queda demasiado grande, no se mueve
+        if self.caja is not None:
+            cx0, cy0, cx1, cy1 = self.caja
+            holgura_x = (x1 - x0) * self.margen / 2
+            holgura_y = (y1 - y0) * self.margen / 2
+            # (contra el borde del frame la holgura no hace falta)
+            dentro = (max(0, x0 - holgura_x) >= cx0 and max(0, y0 - holgura_y) >= cy0
+                      and min(ancho, x1 + holgura_x) <= cx1 and min(alto, y1 + holgura_y) <= cy1)
+            necesaria = (x1 - x0) * (y1 - y0) * (1 + 2 * self.margen) ** 2
+            if dentro and (cx1 - cx0) * (cy1 - cy0) <= 2 * max(necesaria, 1):
+                return
+
+        margen_x = max((x1 - x0) * self.margen, (LADO_MINIMO_ROI * ancho - (x1 - x0)) / 2, 0)
+        margen_y = max((y1 - y0) * self.margen, (LADO_MINIMO_ROI * alto - (y1 - y0)) / 2, 0)
+        caja = (max(0, int(x0 - margen_x)), max(0, int(y0 - margen_y)),
+                min(ancho, int(np.ceil(x1 + margen_x))), min(alto, int(np.ceil(y1 + margen_y))))
+        # Si la caja casi cubre el frame no vale la pena recortar
+        if (caja[2] - caja[0]) * (caja[3] - caja[1]) >= 0.9 * ancho * alto:
+            caja = None
+        self.caja = caja
+
+    def resumen(self) -> dict:
+        return {
+            "frames_recortados": self.recortados,
+            "frames_completos": self.completos,
+            "reintentos": self.reintentos,
+            "ubicaciones": self.ubicaciones,
+        }
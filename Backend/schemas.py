@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_validator
-from typing import Optional
+from typing import List, Optional
 from datetime import date, time
 from datetime import datetime
 
@@ -165,6 +165,7 @@ class MedicionData(BaseModel):
     anguloMin: float
     anguloMax: float
     lado:str
+    video: Optional[str] = None
 class MedicionCreate(MedicionData):
     pass
 class Medicion(MedicionData):
@@ -301,6 +302,16 @@ class ProfesionalUsuarioOut(BaseModel):
     class Config:
         orm_mode = True
 
+class ReanalisisRequest(BaseModel):
+    pistas: str  # id devuelto por /analizar_video/ en el campo "pistas"
+    movimiento: str
+    lado: str
+
+class ReevaluacionRequest(BaseModel):
+    pistas: str
+    movimientos: List[str] = ["flexión", "abducción"]
+    lados: List[str] = ["izquierda", "derecha"]
+
 class LoginRequest(BaseModel):
     correo: str
     contrasena: str
@@ -331,6 +342,7 @@ class SesionWithMedicion(BaseModel):
     anguloMin: float
     anguloMax: float
     lado: str
+    video: Optional[str] = None
 
     @field_validator("fecha", mode='before')
     @classmethod
@@ -359,6 +371,8 @@ class MedicionConSesionCompleta(BaseModel):
     anguloMin: float
     anguloMax: float
     lado: str
+    video: Optional[str] = None
+    imagenes: Optional[dict] = None
 
     movimiento: MovimientoG
 
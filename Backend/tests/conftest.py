@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del backend se importan por nombre, como en main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import almacenamiento
+
+
+@pytest.fixture
+def videos(tmp_path, monkeypatch):
+    """videos/ vacío en una carpeta temporal (RAIZ es relativa al directorio actual)."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(almacenamiento, "_carpetas", set())
+    os.makedirs(almacenamiento.RAIZ)
+    return tmp_path / almacenamiento.RAIZ
+
+
+def escribir(path, tamano=10, antiguedad=0.0):
+    """Crea un archivo de `tamano` bytes usado por última vez hace `antiguedad` segundos."""
+    with open(path, "wb") as f:
+        f.write(b"x" * tamano)
+    fecha = os.path.getmtime(path) - antiguedad
+    os.utime(path, (fecha, fecha))
+    return str(path)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from actividad import DetectorActividad
+
+
+def decidir(frames, fps=10, relleno=0.2):
+    detector = DetectorActividad(fps, relleno)
+    decididos = []
+    for frame in frames:
+        decididos += detector.agregar(frame)
+    decididos += detector.terminar()
+    return detector, decididos
+
+
+def test_sin_movimiento_se_omite_todo():
+    frames = [np.zeros((48, 64, 3), dtype=np.uint8) for _ in range(10)]
+    detector, decididos = decidir(frames)
+    assert len(decididos) == 10
+    assert not any(activo for _, activo in decididos)
+    assert detector.resumen()["frames_omitidos"] == 10
+    assert detector.resumen()["tramos_omitidos"] == [{"desde": 0, "hasta": 9, "inicio": 0.0, "fin": 1.0}]
+
+
+def test_movimiento_con_relleno_antes_y_despues():
+    negro = np.zeros((48, 64, 3), dtype=np.uint8)
+    blanco = np.full((48, 64, 3), 255, dtype=np.uint8)
+    frames = [negro] * 10 + [blanco] + [blanco] * 9
+    detector, decididos = decidir(frames)
+    # Los frames salen en orden y sin perder ninguno
+    assert [frame is blanco for frame, _ in decididos] == [f is blanco for f in frames]
+    activos = [i for i, (_, activo) in enumerate(decididos) if activo]
+    # Movimiento en el frame 10, con 2 frames de relleno a cada lado
+    assert activos == [8, 9, 10, 11, 12]
+    assert detector.resumen()["tramos_omitidos"][0]["hasta"] == 7
+    assert detector.resumen()["tramos_omitidos"][1]["desde"] == 13
+
+
+def test_movimiento_lento_se_acumula():
+    # Cada frame cambia menos que el umbral respecto del anterior, pero no de la referencia
+    frames = [np.full((48, 64, 3), 4 * i, dtype=np.uint8) for i in range(10)]
+    _, decididos = decidir(frames)
+    assert any(activo for _, activo in decididos)
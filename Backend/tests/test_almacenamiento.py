@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+import almacenamiento
+from almacenamiento import archivos_analisis, id_analisis, limpiar, ruta
+
+from conftest import escribir
+
+DIA = 24 * 60 * 60
+A = "aaaaaaaa-0000-0000-0000-000000000000"
+B = "bbbbbbbb-0000-0000-0000-000000000000"
+
+
+@pytest.fixture
+def limites(monkeypatch, videos):
+    monkeypatch.setattr(almacenamiento, "GRACIA", 60)
+    monkeypatch.setattr(almacenamiento, "RETENCION_DIAS", 7)
+    monkeypatch.setattr(almacenamiento, "PRESUPUESTO_VIDEOS", 10 ** 9)
+    return videos
+
+
+def analisis(analisis_id, antiguedad, tamano=10):
+    """Video, pistas y una rendición de un análisis, más su índice."""
+    with open(ruta(f"{analisis_id}_rendiciones.json"), "w", encoding="utf-8") as f:
+        json.dump({"360p": {"archivo": f"{analisis_id}_360p_final.mp4"}}, f)
+    os.utime(ruta(f"{analisis_id}_rendiciones.json"), (0, 0))
+    return [escribir(ruta(analisis_id + sufijo), tamano, antiguedad)
+            for sufijo in ("_final.mp4", "_pistas.npz", "_360p_final.mp4")] + [ruta(f"{analisis_id}_rendiciones.json")]
+
+
+def test_ruta_reparte_en_subcarpetas(videos):
+    path = ruta(f"{A}_final.mp4")
+    assert os.path.dirname(os.path.dirname(path)) == almacenamiento.RAIZ
+    assert len(os.path.basename(os.path.dirname(path))) == 2
+    assert id_analisis(path) == A
+
+
+def test_archivos_analisis_lee_los_indices(videos):
+    archivos = analisis(A, 0)
+    escribir(os.path.join(almacenamiento.RAIZ, f"{A}_poster.jpg"))
+    encontrados = archivos_analisis(A)
+    assert set(encontrados) == set(archivos) | {os.path.join(almacenamiento.RAIZ, f"{A}_poster.jpg")}
+    assert archivos_analisis(B) == []
+
+
+def test_huerfanos_se_borran_pasada_la_gracia(limites):
+    viejo = escribir(ruta("subida.mp4"), antiguedad=120)
+    nuevo = escribir(ruta("otra.mp4"))
+    en_uso = escribir(ruta("en_cola.mp4"), antiguedad=120)
+    resumen = limpiar(set(), {en_uso})
+    assert not os.path.exists(viejo)
+    assert os.path.exists(nuevo) and os.path.exists(en_uso)
+    assert resumen["borrados"] == 1
+
+
+def test_retencion_borra_el_analisis_completo(limites):
+    viejo = analisis(A, 8 * DIA)
+    reciente = analisis(B, 1 * DIA)
+    limpiar(set())
+    assert not any(os.path.exists(p) for p in viejo)
+    assert all(os.path.exists(p) for p in reciente)
+
+
+def test_referenciados_y_en_uso_no_se_tocan(limites):
+    referenciado = analisis(A, 8 * DIA)
+    en_uso = analisis(B, 8 * DIA)
+    limpiar({A}, {en_uso[0]})
+    assert all(os.path.exists(p) for p in referenciado + en_uso)
+
+
+def test_un_archivo_reciente_protege_todo_el_analisis(limites):
+    archivos = analisis(A, 8 * DIA)
+    almacenamiento.tocar(archivos[1])
+    limpiar(set())
+    assert all(os.path.exists(p) for p in archivos)
+
+
+def test_lru_expulsa_analisis_completos_del_menos_usado(limites, monkeypatch):
+    mas_viejo = analisis(A, 3 * DIA, tamano=100)
+    mas_nuevo = analisis(B, 1 * DIA, tamano=100)
+    # Sobran unos bytes: alcanza con sacar un análisis
+    monkeypatch.setattr(almacenamiento, "PRESUPUESTO_VIDEOS", 500)
+    resumen = limpiar(set())
+    assert not any(os.path.exists(p) for p in mas_viejo)
+    assert all(os.path.exists(p) for p in mas_nuevo)
+    assert resumen["bytes"] <= 500
+
+
+def test_tocar_no_cambia_la_fecha_de_modificacion(videos):
+    path = escribir(ruta(f"{A}_final.mp4"), antiguedad=DIA)
+    modificado = os.stat(path).st_mtime_ns
+    almacenamiento.tocar(path)
+    assert os.stat(path).st_mtime_ns == modificado
+    assert os.stat(path).st_atime > modificado / 1e9
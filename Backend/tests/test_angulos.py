@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from angulos import angulo, rango
+
+
+def test_angulo_recto_y_llano():
+    assert angulo((1, 0), (0, 0), (0, 1)) == pytest.approx(90)
+    assert angulo((-1, 0), (0, 0), (1, 0)) == pytest.approx(180)
+    assert angulo((1, 0), (0, 0), (2, 0)) == pytest.approx(0)
+
+
+def test_angulo_no_depende_del_sentido():
+    assert angulo((0, 1), (0, 0), (1, 0)) == pytest.approx(angulo((1, 0), (0, 0), (0, 1)))
+    assert angulo((1, 1), (0, 0), (1, -1)) == pytest.approx(90)
+
+
+def test_angulo_serie_completa_con_nan():
+    a = np.array([[1, 0], [1, 0], [np.nan, np.nan]])
+    b = np.zeros((3, 2))
+    c = np.array([[0, 1], [1, 1], [0, 1]])
+    resultado = angulo(a, b, c)
+    assert resultado.shape == (3,)
+    assert resultado[:2] == pytest.approx([90, 45])
+    assert np.isnan(resultado[2])
+
+
+def test_rango_ignora_nan():
+    resultado = rango([10, np.nan, 30, 20])
+    assert resultado["min_angle"] == 10
+    assert resultado["max_angle"] == 30
+    assert resultado["percentiles"] == {"5": 11.0, "50": 20.0, "95": 29.0}
+
+
+def test_rango_vacio_usa_los_valores_por_defecto():
+    assert rango([]) == {"max_angle": 0.0, "min_angle": 180.0}
+    assert rango([np.nan, np.nan]) == {"max_angle": 0.0, "min_angle": 180.0}
+    assert rango([], minimo_vacio=0, maximo_vacio=0) == {"max_angle": 0, "min_angle": 0}
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+import almacenamiento
+import cache_resultados
+from almacenamiento import ruta
+from cache_resultados import clave
+
+from conftest import escribir
+
+A = "aaaaaaaa-0000-0000-0000-000000000000"
+B = "bbbbbbbb-0000-0000-0000-000000000000"
+
+
+@pytest.fixture
+def cache(videos, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "RUTA_INDICE", os.path.join(almacenamiento.RAIZ, "cache_resultados.json"))
+    monkeypatch.setattr(cache_resultados, "_entradas", cache_resultados.OrderedDict())
+    monkeypatch.setattr(almacenamiento, "_fuente_referencias", None)
+    return cache_resultados
+
+
+def resultado(analisis_id, tamano=100):
+    """Resultado de un análisis con su video, pistas y una imagen en disco."""
+    escribir(ruta(f"{analisis_id}_final.mp4"), tamano)
+    escribir(ruta(f"{analisis_id}_pistas.npz"), tamano)
+    escribir(ruta(f"{analisis_id}_imagenes.json"))
+    escribir(ruta(f"{analisis_id}_poster.jpg"))
+    return {
+        "output": ruta(f"{analisis_id}_final.mp4"),
+        "pistas": analisis_id,
+        "imagenes": {"poster": {"url": f"/imagenes/{analisis_id}_poster.jpg"}},
+        "max_angle": 150.0,
+    }
+
+
+def test_clave_normaliza_y_ordena_opciones():
+    assert clave("h", "Flexión", "Derecha", 4, paso=1, recorte=False) == \
+        clave("h", "flexión", "derecha", 4, recorte=False, paso=1)
+    assert clave("h", "flexión", "derecha", 4) != clave("h", "flexión", "derecha", 5)
+    assert clave("h", "flexión", "derecha", 4, paso=1) != clave("h", "flexión", "derecha", 4, paso=2)
+
+
+def test_obtener_devuelve_una_copia_marcada(cache):
+    guardado = resultado(A)
+    cache.guardar("k", guardado)
+    obtenido = cache.obtener("k")
+    assert obtenido["cache"] is True
+    assert obtenido["max_angle"] == 150.0
+    obtenido["max_angle"] = 0
+    assert cache.obtener("k")["max_angle"] == 150.0
+    assert "cache" not in guardado
+    assert cache.obtener("otra") is None
+
+
+def test_obtener_invalida_si_falta_un_archivo(cache):
+    cache.guardar("k", resultado(A))
+    os.remove(ruta(f"{A}_poster.jpg"))
+    assert cache.obtener("k") is None
+    assert "k" not in cache._entradas
+
+
+def test_indice_sobrevive_al_reinicio(cache, monkeypatch):
+    cache.guardar("k", resultado(A))
+    monkeypatch.setattr(cache_resultados, "_entradas", cache_resultados.OrderedDict())
+    cache.cargar()
+    assert cache.obtener("k")["pistas"] == A
+
+
+def test_expulsion_borra_los_archivos_del_menos_usado(cache, monkeypatch):
+    # Cada resultado ocupa 220 bytes: entran dos
+    monkeypatch.setattr(cache_resultados, "TAMANO_MAXIMO_CACHE", 500)
+    cache.guardar("a", resultado(A))
+    cache.guardar("b", resultado(B))
+    assert cache.obtener("a") is not None
+    # "b" es ahora el menos usado
+    cache.guardar("c", resultado("cccccccc-0000-0000-0000-000000000000"))
+    assert list(cache._entradas) == ["a", "c"]
+    assert almacenamiento.archivos_analisis(B) == []
+    assert len(almacenamiento.archivos_analisis(A)) == 4
+
+
+def test_expulsion_respeta_mediciones_guardadas(cache, monkeypatch):
+    # Entra uno solo
+    monkeypatch.setattr(cache_resultados, "TAMANO_MAXIMO_CACHE", 300)
+    monkeypatch.setattr(almacenamiento, "_fuente_referencias", lambda: [f"{A}_final.mp4"])
+    cache.guardar("a", resultado(A))
+    cache.guardar("b", resultado(B))
+    assert list(cache._entradas) == ["b"]
+    assert len(almacenamiento.archivos_analisis(A)) == 4
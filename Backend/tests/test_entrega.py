@@ -0,0 +1,36 @@
+import pytest
+
+from entrega import elegir_rendicion, validar_id
+
+# Como las devuelve rendiciones_disponibles: de la más chica a la más grande
+RENDICIONES = {
+    "360p": {"ancho": 640, "alto": 360, "bitrate": 800_000},
+    "720p": {"ancho": 1280, "alto": 720, "bitrate": 2_500_000},
+    "original": {"ancho": 1920, "alto": 1080, "bitrate": 6_000_000},
+}
+
+
+@pytest.mark.parametrize("cabeceras, esperada", [
+    ({}, "original"),
+    ({"save-data": "on"}, "360p"),
+    ({"ect": "3g"}, "360p"),
+    ({"ect": "4g"}, "original"),
+    ({"sec-ch-viewport-width": "600"}, "360p"),
+    ({"sec-ch-viewport-width": "600", "sec-ch-dpr": "2"}, "720p"),
+    ({"viewport-width": "1000"}, "720p"),
+    ({"sec-ch-viewport-width": "4000"}, "original"),
+    ({"downlink": "5"}, "720p"),
+    ({"downlink": "0.1"}, "360p"),
+    ({"sec-ch-viewport-width": "abc", "downlink": "x"}, "original"),
+])
+def test_elegir_rendicion(cabeceras, esperada):
+    assert elegir_rendicion(RENDICIONES, cabeceras) == esperada
+
+
+def test_validar_id():
+    analisis_id = "d22ffe4b-27a8-45cc-a2b7-c5652ef6ef88"
+    assert validar_id(analisis_id) == analisis_id
+    assert validar_id(analisis_id.upper()) == analisis_id
+    for invalido in ("../../etc/passwd", "abc", f"{analisis_id}/x", ""):
+        with pytest.raises(ValueError):
+            validar_id(invalido)
@@ -0,0 +1,46 @@
+import pytest
+
+import metricas
+
+
+@pytest.fixture
+def registro(monkeypatch):
+    monkeypatch.setattr(metricas, "_registro", [])
+
+
+def test_contador_y_etiquetas(registro):
+    contador = metricas.Contador("prueba_total", "Ayuda", ["estado"])
+    contador.inc(estado="ok")
+    contador.inc(2, estado="ok")
+    contador.inc(estado='con "comillas"')
+    assert metricas.exponer() == (
+        "# HELP prueba_total Ayuda\n"
+        "# TYPE prueba_total counter\n"
+        'prueba_total{estado="con \\"comillas\\""} 1\n'
+        'prueba_total{estado="ok"} 3\n'
+    )
+
+
+def test_medidor_con_funcion(registro):
+    metricas.Medidor("cola", "Trabajos en cola", funcion=lambda: 2.5)
+    metricas.Medidor("por_estado", "Por estado", ["estado"], funcion=lambda: {"listo": 1})
+    metricas.Medidor("sin_valor", "Nada", funcion=lambda: None)
+    lineas = metricas.exponer().splitlines()
+    assert "cola 2.5" in lineas
+    assert 'por_estado{estado="listo"} 1' in lineas
+    assert not any(linea.startswith("sin_valor") for linea in lineas)
+
+
+def test_histograma_acumula_buckets(registro):
+    histograma = metricas.Histograma("duracion", "Segundos", ["etapa"], buckets=(1, 5))
+    for valor in (0.5, 1, 3, 10):
+        histograma.observar(valor, etapa="pose")
+    lineas = metricas.exponer().splitlines()
+    assert lineas[1] == "# TYPE duracion histogram"
+    assert lineas[2:] == [
+        'duracion_bucket{etapa="pose",le="1"} 2',
+        'duracion_bucket{etapa="pose",le="5"} 3',
+        'duracion_bucket{etapa="pose",le="+Inf"} 4',
+        'duracion_sum{etapa="pose"} 14.5',
+        'duracion_count{etapa="pose"} 4',
+    ]
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from muestreo import PASO_MAXIMO, recorrer_frames
+
+
+class VideoFalso:
+    """Imita a cv2.VideoCapture: cada frame es su número."""
+
+    def __init__(self, frames: int):
+        self.frames = list(range(frames))
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+
+def lineal(frame):
+    # Landmarks que se mueven en línea recta: la interpolación tiene que ser exacta
+    return np.array([[frame, 2.0 * frame]])
+
+
+def test_paso_1_infiere_todo():
+    inferidos = []
+    salida = list(recorrer_frames(VideoFalso(5), lambda f: inferidos.append(f) or lineal(f)))
+    assert inferidos == [0, 1, 2, 3, 4]
+    assert [frame for frame, _, _ in salida] == [0, 1, 2, 3, 4]
+    assert all(inferido for _, _, inferido in salida)
+
+
+def test_interpola_entre_frames_inferidos():
+    inferidos = []
+    salida = list(recorrer_frames(VideoFalso(8), lambda f: inferidos.append(f) or lineal(f), paso=3))
+    # Cada 3 frames, y el último para cerrar la interpolación
+    assert inferidos == [0, 3, 6, 7]
+    assert [frame for frame, _, _ in salida] == list(range(8))
+    assert [inferido for _, _, inferido in salida] == [f in inferidos for f in range(8)]
+    for frame, puntos, _ in salida:
+        assert puntos == pytest.approx(lineal(frame))
+
+
+def test_sin_deteccion_no_se_interpola():
+    salida = list(recorrer_frames(VideoFalso(7), lambda f: None if f == 3 else lineal(f), paso=3))
+    puntos = {frame: p for frame, p, _ in salida}
+    assert puntos[1] is None and puntos[2] is None
+    assert puntos[4] is None and puntos[5] is None
+    assert puntos[6] == pytest.approx(lineal(6))
+
+
+def test_paso_se_limita():
+    inferidos = []
+    list(recorrer_frames(VideoFalso(20), lambda f: inferidos.append(f) or lineal(f), paso=50))
+    assert inferidos[:2] == [0, PASO_MAXIMO]
+
+
+def test_adaptativo_infiere_todo_mientras_hay_movimiento():
+    inferidos = []
+
+    def inferir(frame):
+        inferidos.append(frame)
+        return lineal(frame)
+
+    # Quieto hasta el frame 10, después se mueve 5 grados por frame
+    senal = lambda puntos: 0.0 if puntos[0, 0] < 10 else 5.0 * (puntos[0, 0] - 10)
+    list(recorrer_frames(VideoFalso(20), inferir, senal, paso=4, adaptativo=True))
+    quieto = [f for f in inferidos if f < 10]
+    assert len(quieto) < 10
+    # Desde que se nota el movimiento (a lo más un paso tarde) se infiere cada frame
+    movimiento = [f for f in inferidos if f >= 10]
+    assert movimiento[0] <= 10 + 4
+    assert movimiento == list(range(movimiento[0], 20))
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from recorte import LADO_MINIMO_ROI, SeguidorROI
+
+TAMANO = (1000, 500)
+
+
+def puntos(x0, y0, x1, y1):
+    # Cuatro esquinas, normalizadas al frame
+    return np.array([[x0, y0], [x1, y0], [x0, y1], [x1, y1]], dtype=np.float64)
+
+
+def test_caja_con_margen():
+    roi = SeguidorROI(TAMANO, margen=0.5)
+    roi.actualizar(puntos(0.4, 0.4, 0.6, 0.6))
+    # 200 x 100 px más la mitad a cada lado
+    assert roi.caja == (300, 150, 700, 350)
+
+
+def test_caja_respeta_bordes_y_lado_minimo():
+    roi = SeguidorROI(TAMANO, margen=0.1)
+    roi.actualizar(puntos(0.0, 0.0, 0.01, 0.01))
+    x0, y0, x1, y1 = roi.caja
+    assert x0 == 0 and y0 == 0
+    assert x1 >= LADO_MINIMO_ROI * TAMANO[0] / 2
+    assert y1 >= LADO_MINIMO_ROI * TAMANO[1] / 2
+
+
+def test_sin_puntos_o_casi_todo_el_frame_no_recorta():
+    roi = SeguidorROI(TAMANO)
+    roi.actualizar(puntos(0.4, 0.4, 0.6, 0.6))
+    roi.actualizar(None)
+    assert roi.caja is None
+    roi.actualizar(puntos(0.4, 0.4, 0.6, 0.6)[:3])
+    assert roi.caja is None
+    roi.actualizar(puntos(0.05, 0.05, 0.95, 0.95))
+    assert roi.caja is None
+
+
+def test_caja_no_se_mueve_con_movimientos_chicos():
+    roi = SeguidorROI(TAMANO)
+    roi.actualizar(puntos(0.4, 0.4, 0.6, 0.6))
+    caja = roi.caja
+    roi.actualizar(puntos(0.41, 0.41, 0.61, 0.61))
+    assert roi.caja == caja
+    roi.actualizar(puntos(0.6, 0.6, 0.8, 0.8))
+    assert roi.caja != caja
+
+
+def test_a_frame_completo():
+    roi = SeguidorROI(TAMANO)
+    roi.caja = (100, 50, 600, 300)
+    landmarks = np.array([[0.0, 0.0, 0.2, 1.0], [1.0, 1.0, 0.0, 1.0]])
+    resultado = roi.a_frame_completo(landmarks)
+    assert resultado[:, :2] == pytest.approx(np.array([[0.1, 0.1], [0.6, 0.6]]))
+    assert resultado[0, 2] == pytest.approx(0.1)
+
+
+def test_inferir_recorta_y_vuelve_al_frame_completo():
+    frame = np.zeros((TAMANO[1], TAMANO[0], 3), dtype=np.uint8)
+    tamanos = []
+    respuestas = iter([puntos(0.4, 0.4, 0.6, 0.6), None, None, puntos(0.4, 0.4, 0.6, 0.6)])
+
+    def detectar(imagen):
+        tamanos.append(imagen.shape[:2])
+        return next(respuestas)
+
+    roi = SeguidorROI(TAMANO)
+    assert roi.inferir(frame, detectar, lambda l: l) is not None
+    assert roi.caja is not None
+    # El recorte falla dos veces (con el reintento): se busca en el frame completo
+    assert roi.inferir(frame, detectar, lambda l: l) is not None
+    assert tamanos[0] == tamanos[3] == (TAMANO[1], TAMANO[0])
+    assert tamanos[1] == tamanos[2] != tamanos[0]
+    assert roi.resumen() == {"frames_recortados": 0, "frames_completos": 2, "reintentos": 1, "ubicaciones": 0}
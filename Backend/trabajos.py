@@ -0,0 +1,182 @@
+# Cola de trabajos en segundo plano para el análisis de videos
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import metricas
+import pool_modelos
+from medios import marca_subida
+from movimientos import obtener_analizador
+
+# Segundos que se conserva un trabajo terminado antes de olvidarlo
+RETENCION_TRABAJOS = 60 * 60
+
+# Cada video se procesa en un worker del pool con los modelos ya cargados
+_executor = pool_modelos.crear_executor()
+_trabajos = {}
+_lock = threading.Lock()
+
+
+def iniciar():
+    pool_modelos.precalentar(_executor)
+
+
+def detener():
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _limpiar_viejos():
+    limite = time.time() - RETENCION_TRABAJOS
+    with _lock:
+        viejos = [
+            job_id for job_id, trabajo in _trabajos.items()
+            if trabajo["future"].done() and trabajo["creado"] < limite
+        ]
+        for job_id in viejos:
+            del _trabajos[job_id]
+
+
+def _nombre_movimiento(movimiento) -> str:
+    try:
+        return obtener_analizador(str(movimiento)).nombre
+    except ValueError:
+        return "desconocido"
+
+
+def _movimiento(datos: dict) -> str:
+    # Etiqueta de las métricas: el nombre del analizador (no lo que escribió el
+    # cliente), así los valores posibles son pocos y fijos. Una evaluación junta
+    # sus movimientos, sin repetir y en orden
+    if "movimiento" in datos:
+        return _nombre_movimiento(datos["movimiento"])
+    nombres = sorted({_nombre_movimiento(m) for m in datos.get("movimientos", [])})
+    return ",".join(nombres) or "desconocido"
+
+
+def _registrar_metricas(future, datos):
+    movimiento = _movimiento(datos)
+    if future.cancelled() or future.exception() is not None:
+        metricas.TRABAJOS.inc(movimiento=movimiento, estado="error")
+        return
+    metricas.TRABAJOS.inc(movimiento=movimiento, estado="completado")
+    metricas.registrar_analisis(movimiento, future.result())
+
+
+def contar_en_curso() -> dict:
+    """Trabajos sin terminar por estado (pendiente / procesando)."""
+    conteo = {"pendiente": 0, "procesando": 0}
+    with _lock:
+        for trabajo in _trabajos.values():
+            estado = _estado(trabajo["future"])
+            if estado in conteo:
+                conteo[estado] += 1
+    return conteo
+
+
+def _registrar(future, datos, clave, args=(), creado=None) -> str:
+    job_id = str(uuid.uuid4())
+    with _lock:
+        _trabajos[job_id] = {
+            "future": future,
+            "creado": creado or time.time(),
+            "datos": datos or {},
+            "clave": clave,
+            "args": args,
+        }
+    return job_id
+
+
+def archivos_en_curso() -> set:
+    """Rutas que reciben los trabajos sin terminar (el video subido), con su marca de subida."""
+    archivos = set()
+    with _lock:
+        for trabajo in _trabajos.values():
+            if trabajo["future"].done():
+                continue
+            for arg in trabajo["args"]:
+                if isinstance(arg, str) and os.path.sep in arg:
+                    archivos.update({arg, marca_subida(arg)})
+    return archivos
+
+
+def buscar_en_curso(clave: str):
+    """Id de un trabajo sin terminar con la misma clave (mismo video y opciones), si existe."""
+    with _lock:
+        for job_id, trabajo in _trabajos.items():
+            if trabajo["clave"] == clave and not trabajo["future"].done():
+                return job_id
+    return None
+
+
+def crear_trabajo(funcion, *args, datos: dict = None, clave: str = None, al_completar=None, **kwargs) -> str:
+    """Encola funcion(*args, **kwargs) y devuelve el id del trabajo.
+
+    `datos` (movimiento, lado, ...) se guarda para mostrarlo en el estado.
+    `al_completar(resultado)` se llama cuando el trabajo termina sin error.
+    """
+    global _executor
+    _limpiar_viejos()
+    creado = time.time()
+    try:
+        future = _executor.submit(pool_modelos.ejecutar, creado, funcion, *args, **kwargs)
+    except BrokenProcessPool:
+        # Un worker murió (p. ej. un crash nativo de MediaPipe): se levanta un pool nuevo
+        print("Pool de análisis roto, reiniciando workers")
+        _executor = pool_modelos.crear_executor()
+        future = _executor.submit(pool_modelos.ejecutar, creado, funcion, *args, **kwargs)
+    future.add_done_callback(lambda f: _registrar_metricas(f, datos or {}))
+    if al_completar is not None:
+        def avisar(f):
+            # Un trabajo cancelado (al apagar la API) no tiene resultado
+            if not f.cancelled() and f.exception() is None:
+                try:
+                    al_completar(f.result())
+                except Exception as e:
+                    print(f"Error en al_completar: {e}")
+        future.add_done_callback(avisar)
+    return _registrar(future, datos, clave, args, creado)
+
+
+def crear_trabajo_completado(resultado: dict, datos: dict = None) -> str:
+    """Registra un trabajo que ya tiene resultado (por ejemplo, desde la caché)."""
+    future = Future()
+    future.set_result(resultado)
+    return _registrar(future, datos, None)
+
+
+def _estado(future) -> str:
+    if future.done():
+        return "error" if future.exception() is not None else "completado"
+    if future.running():
+        return "procesando"
+    return "pendiente"
+
+
+def obtener_estado(job_id: str):
+    with _lock:
+        trabajo = _trabajos.get(job_id)
+    if trabajo is None:
+        return None
+
+    future = trabajo["future"]
+    estado = {
+        "job_id": job_id,
+        "estado": _estado(future),
+        "creado": trabajo["creado"],
+        **trabajo["datos"],
+    }
+    if estado["estado"] == "error":
+        estado["detalle"] = str(future.exception())
+    return estado
+
+
+def obtener_resultado(job_id: str):
+    """Devuelve el dict del analizador, o None si el trabajo no existe o no terminó bien."""
+    with _lock:
+        trabajo = _trabajos.get(job_id)
+    if trabajo is None or _estado(trabajo["future"]) != "completado":
+        return None
+    return trabajo["future"].result()
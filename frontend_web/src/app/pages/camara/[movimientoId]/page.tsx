@@ -6,12 +6,14 @@ import { getMovimientoById } from '@/app/services/movimiento.api'
 import { usePatient } from '@/app/context/paciente'
 import { useProfessional } from '@/app/context/profesional'
 import { createSesionWithMedicion } from '@/app/services/sesion.api'
+import { urlVideo } from '@/app/services/video.api'
 
 // Tipos de resultado de análisis
 type AnalisisSimple = {
   tipo: 'simple';
   lado: string;
   output: string;
+  pistas: string; // id del análisis
   max_angle: number;
   min_angle: number;
 };
@@ -20,12 +22,41 @@ type AnalisisPS = {
   tipo: 'ps';
   lado: string;
   output: string;
+  pistas: string; // id del análisis
   pronacion: { max_angle: number; min_angle: number };
   supinacion: { max_angle: number; min_angle: number };
 };
 
 type ResultadoAnalisis = AnalisisSimple | AnalisisPS;
 
+// Respuesta por frame de la medición en vivo (/ws/angulos)
+type MedicionEnVivo = {
+  texto: string | null;
+  acumulado: Record<string, any>;
+  latencia_ms: { total: number };
+};
+
+// Lado largo de los frames que se mandan en vivo (igual a la resolución de inferencia)
+const LADO_FRAME_EN_VIVO = 640;
+
+// El backend procesa el video en segundo plano: se consulta el estado hasta que termine
+async function esperarResultado(jobId: string) {
+  while (true) {
+    const estadoResponse = await fetch(`http://localhost:8000/analisis/${jobId}`);
+    if (!estadoResponse.ok) throw new Error('No se pudo consultar el análisis');
+    const { estado, detalle } = await estadoResponse.json();
+
+    if (estado === 'completado') {
+      const resultadoResponse = await fetch(`http://localhost:8000/analisis/${jobId}/resultado`);
+      if (!resultadoResponse.ok) throw new Error('No se pudo obtener el resultado');
+      return resultadoResponse.json();
+    }
+    if (estado === 'error') throw new Error(detalle);
+
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+  }
+}
+
 export default function CameraRecorder() {
   const { movimientoId } = useParams();
   const [movimiento, setMovimiento] = useState<string>('');
@@ -37,6 +68,9 @@ export default function CameraRecorder() {
   const [recordedVideoURL, setRecordedVideoURL] = useState<string | null>(null);
   const [lado, setLado] = useState<string>('derecha');
   const [resultadoAnalisis, setResultadoAnalisis] = useState<ResultadoAnalisis | null>(null);
+  const [enVivo, setEnVivo] = useState<MedicionEnVivo | null>(null);
+  const wsRef = useRef<WebSocket | null>(null);
+  const canvasRef = useRef<HTMLCanvasElement | null>(null);
 
   const { patient } = usePatient();
   const { professional } = useProfessional();
@@ -63,6 +97,49 @@ export default function CameraRecorder() {
     }
   };
 
+  // Manda el frame actual de la cámara como JPEG. Se espera la respuesta de
+  // cada frame antes de mandar el siguiente, así el ángulo no se atrasa
+  const enviarFrame = () => {
+    const ws = wsRef.current;
+    const video = videoRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN || !video || !video.videoWidth) return;
+
+    const escala = Math.min(1, LADO_FRAME_EN_VIVO / Math.max(video.videoWidth, video.videoHeight));
+    const canvas = canvasRef.current ?? (canvasRef.current = document.createElement('canvas'));
+    canvas.width = Math.round(video.videoWidth * escala);
+    canvas.height = Math.round(video.videoHeight * escala);
+    canvas.getContext('2d')?.drawImage(video, 0, 0, canvas.width, canvas.height);
+    canvas.toBlob((blob) => {
+      if (blob && ws.readyState === WebSocket.OPEN) ws.send(blob);
+    }, 'image/jpeg', 0.8);
+  };
+
+  const iniciarEnVivo = () => {
+    const params = new URLSearchParams({ movimiento, movimiento_id: String(movimientoId), lado });
+    const ws = new WebSocket(`ws://localhost:8000/ws/angulos?${params}`);
+    wsRef.current = ws;
+    setEnVivo(null);
+
+    ws.onopen = () => enviarFrame();
+    ws.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if ('resumen' in data) {
+        ws.close();
+        return;
+      }
+      if (!('error' in data)) setEnVivo(data);
+      enviarFrame();
+    };
+    ws.onclose = () => {
+      if (wsRef.current === ws) wsRef.current = null;
+    };
+  };
+
+  const detenerEnVivo = () => {
+    const ws = wsRef.current;
+    if (ws && ws.readyState === WebSocket.OPEN) ws.send('fin');
+  };
+
   const handleStartRecording = () => {
     if (!stream) return;
 
@@ -82,23 +159,29 @@ export default function CameraRecorder() {
     };
 
     mediaRecorder.onstop = async () => {
+      detenerEnVivo();
       const blob = new Blob(chunks, { type: 'video/webm' });
       const videoURL = URL.createObjectURL(blob);
       setRecordedVideoURL(videoURL);
 
-      const formData = new FormData();
-      formData.append('file', blob, 'grabacion.webm');
-      formData.append('movimiento', movimiento);
-      formData.append('lado', lado);
+      // El video va crudo en el cuerpo: el backend empieza a analizarlo mientras se sube
+      const params = new URLSearchParams({
+        movimiento,
+        movimiento_id: String(movimientoId),
+        lado,
+        nombre: 'grabacion.webm',
+      });
 
       try {
-        const response = await fetch('http://localhost:8000/analizar_video', {
+        const response = await fetch(`http://localhost:8000/analizar_video/stream?${params}`, {
           method: 'POST',
-          body: formData,
+          headers: { 'Content-Type': 'video/webm' },
+          body: blob,
         });
 
         if (response.ok) {
-          const data = await response.json();
+          const { job_id } = await response.json();
+          const data = await esperarResultado(job_id);
           console.log("Resultado backend:", data);
 
           if ('pronacion' in data && 'supinacion' in data) {
@@ -106,6 +189,7 @@ export default function CameraRecorder() {
               tipo: 'ps',
               lado: data.lado,
               output: data.output,
+              pistas: data.pistas,
               pronacion: data.pronacion,
               supinacion: data.supinacion,
             });
@@ -114,6 +198,7 @@ export default function CameraRecorder() {
               tipo: 'simple',
               lado: data.lado,
               output: data.output,
+              pistas: data.pistas,
               max_angle: data.max_angle,
               min_angle: data.min_angle,
             });
@@ -129,6 +214,7 @@ export default function CameraRecorder() {
     };
 
     mediaRecorder.start();
+    iniciarEnVivo();
 
     const interval = setInterval(() => {
       setCountdown((prev) => {
@@ -168,6 +254,7 @@ export default function CameraRecorder() {
           anguloMin: resultadoAnalisis.min_angle,
           anguloMax: resultadoAnalisis.max_angle,
           lado: resultadoAnalisis.lado, // "derecha" o "izquierda"
+          video: resultadoAnalisis.output ?? null, // así el video no se borra del servidor
         };
         console.log("Datos a enviar:", dataToSend);
         await createSesionWithMedicion(dataToSend);
@@ -182,6 +269,7 @@ export default function CameraRecorder() {
             anguloMin: resultadoAnalisis.pronacion.min_angle,
             anguloMax: resultadoAnalisis.pronacion.max_angle,
             lado: `${resultadoAnalisis.lado} - pronación`,
+            video: resultadoAnalisis.output ?? null,
           },
           {
             ...sesionData,
@@ -190,6 +278,7 @@ export default function CameraRecorder() {
             anguloMin: resultadoAnalisis.supinacion.min_angle,
             anguloMax: resultadoAnalisis.supinacion.max_angle,
             lado: `${resultadoAnalisis.lado} - supinación`,
+            video: resultadoAnalisis.output ?? null,
           },
         ];
 
@@ -267,6 +356,22 @@ export default function CameraRecorder() {
         </p>
       )}
 
+      {enVivo && (
+        <div className="mb-4 p-3 bg-gray-100 rounded shadow w-full max-w-md">
+          <p className="font-semibold">{enVivo.texto ?? 'Sin detección'}</p>
+          {Object.entries(enVivo.acumulado).map(([clave, valor]) =>
+            typeof valor === 'number' ? (
+              <p key={clave}>{clave === 'max_angle' ? 'Máx' : 'Mín'}: {valor.toFixed(1)}°</p>
+            ) : (
+              <p key={clave}>
+                {clave}: {valor.min_angle.toFixed(1)}° – {valor.max_angle.toFixed(1)}°
+              </p>
+            )
+          )}
+          <p className="text-sm text-gray-600">Latencia: {enVivo.latencia_ms.total} ms</p>
+        </div>
+      )}
+
       {recordedVideoURL && (
         <div className="mt-4">
           <p className="font-semibold mb-2">Video grabado:</p>
@@ -301,7 +406,7 @@ export default function CameraRecorder() {
           )}
 
           <video
-            src={`http://localhost:8000/${resultadoAnalisis.output}`}
+            src={urlVideo(resultadoAnalisis.pistas)}
             controls
             className="mt-4 w-full rounded"
           />
@@ -6,6 +6,7 @@ import { getArticulaciones } from "@/app/services/articulacion.api";
 import { getMovimientos } from "@/app/services/movimiento.api";
 import { getPacientesInfo, updatePacienteConUsuario } from "@/app/services/paciente.api";
 import { getMedicionesCompletasPorPaciente } from "@/app/services/sesion.api";
+import { urlVideo } from "@/app/services/video.api";
 import type { ScriptableContext } from "chart.js";
 import { useAuth } from "@/app/context/entro";
 import {
@@ -502,6 +503,7 @@ export default function PerfilPaciente() {
                     <th className="p-2 border">Ángulo Minimo Esperado</th>
                     <th className="p-2 border">Fecha</th>
                     <th className="p-2 border">Hora</th>
+                    <th className="p-2 border">Video</th>
 
                   </tr>
                 </thead>
@@ -519,6 +521,25 @@ export default function PerfilPaciente() {
                       </td>
                       <td className="p-2 border">{med.sesion?.fecha ?? "N/A"}</td>
                       <td className="p-2 border">{med.sesion?.hora ?? "N/A"}</td>
+                      <td className="p-2 border">
+                        {/* Imagen del ángulo máximo (o el poster): unos KB en vez del video completo */}
+                        {med.imagenes ? (
+                          <a
+                            href={urlVideo(med.video.split("/").pop().split("_")[0])}
+                            target="_blank"
+                            rel="noreferrer"
+                          >
+                            <img
+                              src={`http://localhost:8000/${med.imagenes.pico?.url ?? med.imagenes.poster}`}
+                              alt="Ángulo máximo"
+                              loading="lazy"
+                              className="w-24 rounded"
+                            />
+                          </a>
+                        ) : (
+                          "N/A"
+                        )}
+                      </td>
                     </tr>
                   ))}
                 </tbody>
@@ -0,0 +1,22 @@
+const API_URL = "http://localhost:8000";
+
+// El backend guarda cada video en varias calidades (ver medios.RENDICIONES).
+// Las client hints que usaría para elegir (ancho de pantalla, tipo de conexión)
+// no llegan en pedidos a otro origen, así que la calidad se elige acá y se pide
+// con ?calidad=
+const ANCHO_PREVIA = 640; // ancho de la versión de 360p en un video horizontal
+const DOWNLINK_MINIMO_MBPS = 2.5; // por debajo, el original se corta al reproducir
+const CONEXIONES_LENTAS = ["slow-2g", "2g", "3g"];
+
+export const calidadVideo = (): "360p" | "original" => {
+  if (typeof window === "undefined") return "original";
+  const conexion = (navigator as any).connection;
+  if (conexion?.saveData || CONEXIONES_LENTAS.includes(conexion?.effectiveType)) return "360p";
+  if (conexion?.downlink && conexion.downlink < DOWNLINK_MINIMO_MBPS) return "360p";
+  if (window.innerWidth * (window.devicePixelRatio || 1) <= ANCHO_PREVIA) return "360p";
+  return "original";
+};
+
+// URL del video anotado de un análisis, en la calidad que conviene a este navegador
+export const urlVideo = (analisisId: string) =>
+  `${API_URL}/video/${analisisId}?calidad=${calidadVideo()}`;
@@ -33,6 +33,30 @@ const requestPermissions = async () => {
   return true;
 };
 
+// El backend procesa el video en segundo plano: se consulta el estado hasta que termine
+async function esperarResultado(jobId: string) {
+  while (true) {
+    const estadoResponse = await fetch(`${API_CONFIG.BASE_URL}/analisis/${jobId}`);
+    if (!estadoResponse.ok) throw new Error('No se pudo consultar el análisis');
+    const { estado, detalle } = await estadoResponse.json();
+
+    if (estado === 'completado') {
+      const resultadoResponse = await fetch(`${API_CONFIG.BASE_URL}/analisis/${jobId}/resultado`);
+      if (!resultadoResponse.ok) throw new Error('No se pudo obtener el resultado');
+      return resultadoResponse.json();
+    }
+    if (estado === 'error') throw new Error(detalle);
+
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+  }
+}
+
+// Sin ángulo no se guarda nada: un 0 se confundiría con una medición real
+const angulo = (valor: any): number => {
+  if (typeof valor !== 'number') throw new Error('El análisis no devolvió el ángulo');
+  return valor;
+};
+
 export default function MedicionPage() {
   const { movimiento } = useLocalSearchParams() as { movimiento: string };
   const [videoUri, setVideoUri] = useState<string | null>(null);
@@ -128,20 +152,21 @@ export default function MedicionPage() {
         notas: '',
         ejercicioId: null,
         movimientoId: Number(movimiento),
+        video: resultado.output ?? null, // así el video no se borra del servidor
       };
 
       if (nombreNormalizado === "Pronación y Supinación") {
         sesiones = [
           {
             ...sesionBase,
-            anguloMin: resultado.pronacion?.min_angle || 0,
-            anguloMax: resultado.pronacion?.max_angle || 0,
+            anguloMin: angulo(resultado.pronacion?.min_angle),
+            anguloMax: angulo(resultado.pronacion?.max_angle),
             lado: `${lado} - pronación`,
           },
           {
             ...sesionBase,
-            anguloMin: resultado.supinacion?.min_angle || 0,
-            anguloMax: resultado.supinacion?.max_angle || 0,
+            anguloMin: angulo(resultado.supinacion?.min_angle),
+            anguloMax: angulo(resultado.supinacion?.max_angle),
             lado: `${lado} - supinación`,
           },
         ];
@@ -149,8 +174,8 @@ export default function MedicionPage() {
         sesiones = [
           {
             ...sesionBase,
-            anguloMin: resultado.min_angle || 0,
-            anguloMax: resultado.max_angle || 0,
+            anguloMin: angulo(resultado.min_angle),
+            anguloMax: angulo(resultado.max_angle),
             lado: lado,
           },
         ];
@@ -201,7 +226,8 @@ export default function MedicionPage() {
         throw new Error('Error al analizar el video');
       }
 
-      const resultado = await res.json();
+      const { job_id } = await res.json();
+      const resultado = await esperarResultado(job_id);
       console.log('Resultado del análisis:', resultado);
 
       if (resultado) {